@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Скорость разбора ответов сервера разными декодерами JSON
+
+    python -m benchmarks.decode [--lessons 5000] [--runs 50] [--payload FILE ...]
+
+Сравнивает прежний разбор (response.json() и отдельные проверки success)
+с Ruobr._parse для каждого установленного декодера из ruobr_api.decoders.
+По умолчанию используются синтетические ответы timetable2/ и all_marks/,
+через --payload можно передать сохранённые ответы. Результат выводится
+в JSON: медиана времени разбора одного ответа и ускорение относительно
+прежнего способа.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from benchmarks.models import lesson
+from ruobr_api import NoSuccessException, Ruobr
+from ruobr_api.decoders import BACKENDS
+
+
+def legacy(response: httpx.Response):
+    """Разбор ответа до появления ruobr_api.decoders"""
+
+    try:
+        response = response.json()
+    except:
+        raise NoSuccessException(response.text)
+    if isinstance(response, dict):
+        if "success" in response.keys():
+            if not (response["success"]):
+                if "error" in response.keys():
+                    raise NoSuccessException(response["error"])
+                raise NoSuccessException(response)
+    return response
+
+
+def payloads(lessons: int, files: list) -> dict:
+    if files:
+        result = {}
+        for path in files:
+            with open(path, "rb") as f:
+                result[os.path.basename(path)] = f.read()
+        return result
+    marks = {
+        "data": {
+            "marks": [
+                {"mark": "54"[i % 2], "date": "2020-04-27", "weight": 1 + i % 3}
+                for i in range(lessons // 10)
+            ]
+        }
+    }
+    return {
+        "timetable2": json.dumps(
+            {"lessons": [lesson(i) for i in range(lessons)]}, ensure_ascii=False
+        ).encode(),
+        "all_marks": json.dumps(marks, ensure_ascii=False).encode(),
+    }
+
+
+def median_ms(parse, payload: bytes, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        # Ответ создаётся заново, чтобы httpx не переиспользовал разобранный текст
+        response = httpx.Response(200, content=payload)
+        started = time.perf_counter()
+        parse(response)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lessons", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--payload", nargs="*", default=[])
+    args = parser.parse_args()
+
+    results = []
+    for name, payload in payloads(args.lessons, args.payload).items():
+        base = median_ms(legacy, payload, args.runs)
+        row = {"payload": name, "bytes": len(payload), "legacy_ms": base}
+        for backend in BACKENDS:
+            ruobr = Ruobr("username", "password", decoder=backend)
+            try:
+                ms = median_ms(ruobr._parse, payload, args.runs)
+            except ImportError:
+                continue
+            row[f"{backend}_ms"] = ms
+            row[f"{backend}_speedup"] = base / ms
+        results.append(row)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
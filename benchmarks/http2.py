@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение HTTP/1.1 и HTTP/2 для AsyncRuobr
+
+    python -m benchmarks.http2 [--requests 500] [--concurrency 50]
+        [--latency 0.02] [--base-url URL]
+
+Отправляет --requests разных запросов get_message одновременно (не больше
+--concurrency) клиентом AsyncRuobr(http2=False) и AsyncRuobr(http2=...).
+Без --base-url запускается локальная заглушка ruobr_api.stub с задержкой
+--latency, она отвечает и по HTTP/1.1, и по HTTP/2 без TLS (h2c). Для адреса
+http:// используется http2='h2c', для https:// - http2=True с выбором
+протокола при установке TLS. Выводит JSON с версиями HTTP, временем,
+запросами в секунду, задержками и числом открытых соединений.
+Нужен пакет h2: pip install ruobr_api[http2]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+import ruobr_api
+
+
+async def run(args, http2) -> dict:
+    latencies, versions, streams = [], set(), set()
+
+    def on_response(target, response, elapsed, **info):
+        latencies.append(elapsed)
+        versions.add(response.http_version)
+        streams.add(id(response.extensions.get("network_stream")))
+
+    async with ruobr_api.AsyncRuobr(
+        args.username,
+        args.password,
+        base_url=args.base_url,
+        limits=httpx.Limits(max_connections=args.concurrency),
+        hooks={"response": [on_response]},
+        http2=http2,
+    ) as ruobr:
+        await ruobr.get_user()
+        latencies.clear()
+
+        started = time.perf_counter()
+        async for _ in ruobr.get_messages(
+            range(1, args.requests + 1), workers=args.concurrency
+        ):
+            pass
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "http_versions": sorted(versions),
+        "connections": len(streams),
+        "seconds": elapsed,
+        "requests_per_second": args.requests / elapsed,
+        "latency_ms": {
+            "p50": statistics.median(latencies) * 1000,
+            "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url")
+    parser.add_argument("--username", default="username")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url is None:
+        from ruobr_api.stub import StubServer
+
+        server = StubServer(latency=args.latency)
+        server.start()
+        args.base_url = server.base_url
+    http2 = True if args.base_url.startswith("https://") else "h2c"
+
+    try:
+        report = {"http1": await run(args, False), "http2": await run(args, http2)}
+    finally:
+        if server is not None:
+            server.stop()
+    if report["http2"]["http_versions"] != ["HTTP/2"]:
+        raise SystemExit("Сервер не ответил по HTTP/2: " + json.dumps(report))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
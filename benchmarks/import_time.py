@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Замер времени импорта ruobr_api и первого запроса
+
+    python -m benchmarks.import_time [--runs 20] [--max-import-ms 60]
+
+Каждый замер выполняется в отдельном процессе, чтобы модули не были уже
+загружены. Первый запрос отправляется на локальный HTTP-сервер, поэтому
+в его время входит отложенный импорт httpx, но не сеть. Результат выводится
+в JSON; при превышении --max-import-ms или загрузке тяжёлых модулей при
+импорте скрипт завершается с кодом 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("httpx", "asyncio", "concurrent.futures", "sqlite3")
+
+PROBE = r"""
+import json, sys, threading, time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'{"status": "child", "id": 1, "success": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+server = HTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+started = time.perf_counter()
+import ruobr_api
+imported = time.perf_counter()
+heavy = [m for m in %r if m in sys.modules]
+
+r = ruobr_api.Ruobr("username", "password", base_url="http://127.0.0.1:%%d/" %% server.server_port)
+r.get_user()
+called = time.perf_counter()
+r.close()
+server.shutdown()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_call_ms": (called - imported) * 1000,
+    "heavy_modules": heavy,
+}))
+""" % (HEAVY,)
+
+
+def probe() -> dict:
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}
+    )
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    results = [probe() for _ in range(args.runs)]
+    imports = [r["import_ms"] for r in results]
+    calls = [r["first_call_ms"] for r in results]
+    report = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "import_ms": {"median": statistics.median(imports), "min": min(imports)},
+        "first_call_ms": {"median": statistics.median(calls), "min": min(calls)},
+        "heavy_modules": sorted({m for r in results for m in r["heavy_modules"]}),
+    }
+    print(json.dumps(report, indent=2))
+
+    failed = bool(report["heavy_modules"])
+    if args.max_import_ms is not None:
+        failed = failed or report["import_ms"]["median"] > args.max_import_ms
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
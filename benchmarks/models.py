@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Сравнение памяти словарей и моделей ruobr_api.models
+
+    python -m benchmarks.models [--lessons 100000] [--messages 20000]
+        [--repeat 3]
+
+Синтетические уроки и сообщения разбираются из JSON как без typed и как
+с typed (разбор в словари и превращение их в модели, как в клиенте).
+Для обоих вариантов замеряются память результата и пиковая память за время
+разбора (tracemalloc), число объектов, которые отслеживает сборщик мусора,
+и время процессора (лучшее из --repeat запусков без tracemalloc).
+Результат выводится в JSON.
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from ruobr_api.models import Lesson, Message, typed
+
+
+def lesson(i: int) -> dict:
+    return {
+        "id": i,
+        "date": "2020-04-27",
+        "time_start": "08:30:00",
+        "time_end": "09:10:00",
+        "subject": ("Алгебра", "Физика", "Литература")[i % 3],
+        "staff": "Иванова Мария Петровна",
+        "topic": "Решение квадратных уравнений",
+        "task": {"id": i, "title": "№ 123, 124", "doc": False, "deadline": None},
+        "marks": [{"question_name": "Ответ на уроке", "mark": "5"}],
+        "attendance": [],
+        "place": "каб. 214",
+    }
+
+
+def message(i: int) -> dict:
+    return {
+        "id": i,
+        "type_id": 1,
+        "subject": "Родительское собрание",
+        "author": "Классный руководитель",
+        "post_date": "2020-04-27 12:00:00",
+        "read": True,
+        "last_msg_text": "Собрание состоится в пятницу в 18:00 в кабинете 214",
+        "files": [],
+    }
+
+
+def measure(build, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.process_time()
+        data = build()
+        seconds.append(time.process_time() - started)
+        del data
+
+    gc.collect()
+    objects = len(gc.get_objects())
+    tracemalloc.start()
+    data = build()
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    tracked = len(gc.get_objects()) - objects
+    del data
+    return {
+        "bytes": size,
+        "peak_bytes": peak,
+        "gc_objects": tracked,
+        "cpu_seconds": min(seconds),
+    }
+
+
+def compare(name: str, payload: bytes, model: type, repeat: int) -> dict:
+    dicts = measure(lambda: json.loads(payload), repeat)
+    # Словари живут, пока из них строятся модели, поэтому в пик входят оба
+    models = measure(lambda: typed(model, json.loads(payload)), repeat)
+    return {
+        "records": name,
+        "dict": dicts,
+        "typed": models,
+        "memory_ratio": models["bytes"] / dicts["bytes"],
+        "peak_ratio": models["peak_bytes"] / dicts["peak_bytes"],
+        "cpu_ratio": models["cpu_seconds"] / dicts["cpu_seconds"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--lessons", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lessons = json.dumps([lesson(i) for i in range(args.lessons)]).encode()
+    messages = json.dumps([message(i) for i in range(args.messages)]).encode()
+    results = [
+        compare(f"{args.lessons} lessons", lessons, Lesson, args.repeat),
+        compare(f"{args.messages} messages", messages, Message, args.repeat),
+    ]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Пропускная способность и задержки Ruobr и AsyncRuobr на типичных нагрузках
+
+    python -m benchmarks.throughput [--accounts 200] [--concurrency 50]
+        [--scenarios login profile mailbox timetable] [--modes sync async]
+        [--latency 0.005] [--base-url URL] [--output FILE] [--compare FILE]
+
+Сценарии:
+    login      только авторизация (get_user) - «шторм» входов
+    profile    авторизация и все данные профиля: справочник, достижения,
+               итоговые оценки, одноклассники, книги, дни рождения, питание
+    mailbox    почта и все сообщения через get_messages
+    timetable  дневник за учебный год одним запросом
+
+Режим sync обходит аккаунты в пуле из --concurrency потоков, async - не больше
+--concurrency аккаунтов одновременно в одном цикле событий. Клиент HTTP
+общий для всех аккаунтов. Каждый прогон выполняется в отдельном процессе,
+поэтому пиковая память (RSS) не смешивается между прогонами. Без --base-url
+запускается локальная заглушка ruobr_api.stub с задержкой --latency.
+
+Для каждого прогона выводятся запросы и аккаунты в секунду, задержки HTTP-
+запросов p50/p95/p99, пиковый RSS и память Python на запрос: пик tracemalloc
+из отдельного короткого прогона, деленный на число его запросов. --output
+сохраняет JSON, --compare сравнивает результат с сохранённым ранее, например
+с прогоном другой версии библиотеки.
+
+Старые версии без параметров client и base_url тоже поддерживаются: запросы
+модульных httpx.get и httpx.AsyncClient перенаправляются в общий клиент на
+--base-url, а почта загружается через get_mail и get_message. Для сравнения
+скопируйте папку benchmarks в копию старой версии (git worktree) и запустите
+там с --base-url заглушки из новой: python -m ruobr_api.stub --latency 0.005
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import ruobr_api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("login", "profile", "mailbox", "timetable")
+MODES = ("sync", "async")
+PROFILE = (
+    "get_guide",
+    "get_achievements",
+    "get_control_marks",
+    "get_classmates",
+    "get_books",
+    "get_birthdays",
+    "get_food_info",
+)
+YEAR = ("2019-09-01", "2020-05-31")
+OFFICIAL_URL = "https://api3d.ruobr.ru/"
+# Старые версии создают запросы сами через модуль httpx
+LEGACY = "base_url" not in inspect.signature(ruobr_api.Ruobr.__init__).parameters
+
+
+def message_ids(mail: list) -> list:
+    return [m["id"] for m in mail if m.get("type_id") != 2]
+
+
+def scenario_sync(name: str, ruobr: ruobr_api.Ruobr):
+    ruobr.get_user()
+    if name == "profile":
+        for method in PROFILE:
+            getattr(ruobr, method)()
+    elif name == "mailbox" and LEGACY:
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(ruobr.get_message, message_ids(ruobr.get_mail())))
+    elif name == "mailbox":
+        for _ in ruobr.get_messages(workers=4):
+            pass
+    elif name == "timetable":
+        ruobr.get_timetable(*YEAR)
+
+
+async def scenario_async(name: str, ruobr: ruobr_api.AsyncRuobr):
+    await ruobr.get_user()
+    if name == "profile":
+        await asyncio.gather(*[getattr(ruobr, method)() for method in PROFILE])
+    elif name == "mailbox" and LEGACY:
+        limit = asyncio.Semaphore(4)
+
+        async def fetch(message_id):
+            async with limit:
+                await ruobr.get_message(message_id)
+
+        ids = message_ids(await ruobr.get_mail())
+        await asyncio.gather(*[fetch(message_id) for message_id in ids])
+    elif name == "mailbox":
+        async for _ in ruobr.get_messages(workers=4):
+            pass
+    elif name == "timetable":
+        await ruobr.get_timetable(*YEAR)
+
+
+def make_ruobr(cls: type, i: int, client, base_url: str):
+    if LEGACY:
+        return cls(f"user{i}", "password")
+    return cls(f"user{i}", "password", client=client, base_url=base_url)
+
+
+def redirect(url: str, base_url: str) -> str:
+    return base_url + url[len(OFFICIAL_URL) :] if url.startswith(OFFICIAL_URL) else url
+
+
+class _LegacyAsyncClient(object):
+    """Подменяет httpx.AsyncClient старой версии общим клиентом"""
+
+    def __init__(self, client: httpx.AsyncClient, base_url: str):
+        self.client = client
+        self.base_url = base_url
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def get(self, url: str, **kwargs):
+        return await self.client.get(redirect(url, self.base_url), **kwargs)
+
+
+class Recorder(object):
+    """Замеряет время каждого HTTP-запроса через event_hooks общего клиента httpx
+    Не зависит от хуков самой библиотеки, которых нет в старых версиях"""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.failures = {}  # тип исключения -> число аккаунтов
+
+    def failed(self, error: Exception) -> int:
+        name = type(error).__name__
+        self.failures[name] = self.failures.get(name, 0) + 1
+        return 1
+
+    def on_request(self, request: httpx.Request):
+        request.extensions["started"] = time.perf_counter()
+
+    def on_response(self, response: httpx.Response):
+        self.latencies.append(
+            time.perf_counter() - response.request.extensions["started"]
+        )
+        if response.status_code >= 400:
+            self.errors += 1
+
+    async def on_request_async(self, request: httpx.Request):
+        self.on_request(request)
+
+    async def on_response_async(self, response: httpx.Response):
+        self.on_response(response)
+
+
+def run_sync(args, recorder: Recorder, accounts: int):
+    client = httpx.Client(
+        limits=httpx.Limits(max_connections=args.concurrency),
+        event_hooks={
+            "request": [recorder.on_request],
+            "response": [recorder.on_response],
+        },
+    )
+
+    def account(i):
+        ruobr = make_ruobr(ruobr_api.Ruobr, i, client, args.base_url)
+        try:
+            scenario_sync(args.run[0], ruobr)
+        except Exception as e:
+            return recorder.failed(e)
+        return 0
+
+    get = httpx.get
+    if LEGACY:
+        httpx.get = lambda url, **kwargs: client.get(
+            redirect(url, args.base_url), **kwargs
+        )
+    try:
+        with client, ThreadPoolExecutor(args.concurrency) as pool:
+            return sum(pool.map(account, range(accounts)))
+    finally:
+        httpx.get = get
+
+
+async def run_async(args, recorder: Recorder, accounts: int):
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=args.concurrency),
+        event_hooks={
+            "request": [recorder.on_request_async],
+            "response": [recorder.on_response_async],
+        },
+    ) as client:
+
+        async def account(i):
+            async with limit:
+                ruobr = make_ruobr(ruobr_api.AsyncRuobr, i, client, args.base_url)
+                try:
+                    await scenario_async(args.run[0], ruobr)
+                except Exception as e:
+                    return recorder.failed(e)
+                return 0
+
+        async_client = httpx.AsyncClient
+        if LEGACY:
+            httpx.AsyncClient = _LegacyAsyncClient(client, args.base_url)
+        try:
+            return sum(await asyncio.gather(*[account(i) for i in range(accounts)]))
+        finally:
+            httpx.AsyncClient = async_client
+
+
+def execute(args, accounts: int):
+    recorder = Recorder()
+    started = time.perf_counter()
+    if args.run[1] == "sync":
+        failed = run_sync(args, recorder, accounts)
+    else:
+        failed = asyncio.run(run_async(args, recorder, accounts))
+    return recorder, failed, time.perf_counter() - started
+
+
+def percentile(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def worker(args):
+    """Один прогон сценария, выполняется в отдельном процессе"""
+
+    recorder, failed, elapsed = execute(args, args.accounts)
+    if failed == args.accounts:
+        raise SystemExit(
+            f"{args.run[0]}/{args.run[1]}: все аккаунты завершились ошибкой "
+            f"{recorder.failures}"
+        )
+    latencies = sorted(recorder.latencies)
+    # ru_maxrss в Linux - в килобайтах, в macOS - в байтах
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss /= 1024 * 1024 if sys.platform == "darwin" else 1024
+
+    # Отдельный короткий прогон под tracemalloc: он сильно замедляет работу
+    # и занимает память сам, поэтому идёт после замеров скорости и RSS
+    tracemalloc.start()
+    traced, _, _ = execute(args, max(1, args.accounts // 10))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(
+        json.dumps(
+            {
+                "scenario": args.run[0],
+                "mode": args.run[1],
+                "accounts": args.accounts,
+                "concurrency": args.concurrency,
+                "failed_accounts": failed,
+                "failures": recorder.failures,
+                "requests": len(latencies),
+                "http_errors": recorder.errors,
+                "seconds": elapsed,
+                "requests_per_second": len(latencies) / elapsed,
+                "accounts_per_second": args.accounts / elapsed,
+                "latency_ms": {
+                    "p50": percentile(latencies, 0.50),
+                    "p95": percentile(latencies, 0.95),
+                    "p99": percentile(latencies, 0.99),
+                },
+                "peak_rss_mb": rss,
+                "traced_kb_per_request": peak / max(1, len(traced.latencies)) / 1024,
+            }
+        )
+    )
+
+
+def compare(results: list, baseline: list) -> list:
+    """Отношение метрик к сохранённому прогону: больше 1 - быстрее/больше"""
+
+    previous = {(r["scenario"], r["mode"]): r for r in baseline}
+    rows = []
+    for result in results:
+        old = previous.get((result["scenario"], result["mode"]))
+        if old is None:
+            continue
+        rows.append(
+            {
+                "scenario": result["scenario"],
+                "mode": result["mode"],
+                "requests_per_second": result["requests_per_second"]
+                / old["requests_per_second"],
+                "p99": result["latency_ms"]["p99"] / old["latency_ms"]["p99"],
+                "peak_rss_mb": result["peak_rss_mb"] / old["peak_rss_mb"],
+            }
+        )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--base-url")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--run", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        return worker(args)
+
+    server = None
+    if args.base_url is None:
+        from ruobr_api.stub import StubServer
+
+        server = StubServer(latency=args.latency)
+        server.start()
+        args.base_url = server.base_url
+
+    results = []
+    try:
+        for scenario in args.scenarios:
+            for mode in args.modes:
+                command = [sys.executable, "-m", "benchmarks.throughput"]
+                command += ["--run", scenario, mode, "--base-url", args.base_url]
+                command += ["--accounts", str(args.accounts)]
+                command += ["--concurrency", str(args.concurrency)]
+                output = subprocess.check_output(
+                    command, cwd=ROOT, env={**os.environ, "PYTHONPATH": ROOT}
+                )
+                results.append(json.loads(output))
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "version": ruobr_api.__version__,
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    if args.compare:
+        with open(args.compare, encoding="UTF-8") as f:
+            report["compare"] = compare(results, json.load(f)["results"])
+    if args.output:
+        with open(args.output, "w", encoding="UTF-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
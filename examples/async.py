@@ -1,15 +1,15 @@
 import asyncio
 from ruobr_api import AsyncRuobr
 
-ruobr = AsyncRuobr("username", "password")
 
 async def main():
-    mail = await ruobr.get_mail()
-    letters = await asyncio.gather(
-        *[ruobr.get_message(m["id"]) for m in mail if m["type_id"] != 2]
-    )
-    print(letters)
+    # Соединения переиспользуются между запросами и закрываются при выходе
+    async with AsyncRuobr("username", "password") as ruobr:
+        # Не больше 8 сообщений загружается одновременно,
+        # сообщения с type_id == 2 пропускаются
+        async for message_id, letter in ruobr.get_messages(workers=8):
+            print(message_id, letter)
 
 
 loop = asyncio.get_event_loop()
-loop.run_until_complete(main())
\ No newline at end of file
+loop.run_until_complete(main())
@@ -23,3 +23,7 @@ if user.is_applicant:  # Обработка родительского акка
         user.child = int(number) - 1  # Выбрать нужного ребёнка
 
 print(user.user)
+
+# Данные можно получить для конкретного ребёнка, не меняя поле child,
+# или сразу для всех детей: {id ребёнка: результат}
+print(user.for_each_child("get_guide"))
@@ -0,0 +1,19 @@
+import asyncio
+from ruobr_api.fleet import poll
+
+credentials = [("username1", "password1"), ("username2", "password2")]
+
+
+async def main():
+    # Не больше 20 запросов одновременно и не больше 2 на один аккаунт
+    async for r in poll(
+        credentials, ["get_mail", "get_control_marks"], concurrency=20, per_account=2
+    ):
+        if r.error is not None:
+            print(r.username, r.method, "ошибка:", r.error)
+        else:
+            print(r.username, r.method, r.result)
+
+
+loop = asyncio.get_event_loop()
+loop.run_until_complete(main())
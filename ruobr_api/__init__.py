@@ -16,9 +16,15 @@ api3d.ruobr.ru
 :copyright: (c) 2021 raitonoberu
 """
 
-from ruobr_api.__main__ import Ruobr, AsyncRuobr
+from ruobr_api.client import Ruobr, AsyncRuobr
+from ruobr_api.cache import SQLiteCache, TTLCache
+from ruobr_api.changes import ChangeTracker
+from ruobr_api.metrics import Metrics
+from ruobr_api.ratelimit import FileTokenBucket, TokenBucket
+from ruobr_api.retry import CircuitBreaker, RetryPolicy
 from ruobr_api.exceptions import (
     AuthenticationException,
+    CircuitOpenException,
     NoChildrenException,
     NoSuccessException,
 )
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from importlib import import_module
+
+
+class LazyModule(object):
+    """Модуль, который импортируется при первом обращении к его атрибутам
+    Позволяет не платить за импорт httpx и asyncio, пока они не нужны"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}>"
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.utils import mark_records, parse_mark
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "Для аналитики нужен numpy: pip install ruobr_api[analytics]"
+        ) from None
+    return numpy
+
+
+class MarksFrame(object):
+    """Оценки многих учеников в виде столбцов NumPy
+    Все расчёты выполняются группировкой по столбцам student, period и
+    subject_id без циклов по записям, поэтому отчёт по школе строится за
+    один проход. Оценки, которые не являются числом (н, зч), отбрасываются"""
+
+    def __init__(self, rows: Sequence[Tuple[Hashable, int, int, float, float]]):
+        np = _numpy()
+        students = sorted({row[0] for row in rows}, key=str)
+        codes = {student: i for i, student in enumerate(students)}
+
+        self.students = students  # Номер ученика в столбце -> его метка
+        self.student = np.fromiter((codes[r[0]] for r in rows), np.int64, len(rows))
+        self.period = np.fromiter((r[1] for r in rows), np.int64, len(rows))
+        self.subject_id = np.fromiter((r[2] for r in rows), np.int64, len(rows))
+        self.value = np.fromiter((r[3] for r in rows), np.float64, len(rows))
+        self.weight = np.fromiter((r[4] for r in rows), np.float64, len(rows))
+
+        valid = ~np.isnan(self.value)
+        for column in ("student", "period", "subject_id", "value", "weight"):
+            setattr(self, column, getattr(self, column)[valid])
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    @classmethod
+    def from_control_marks(cls, students: Dict[Hashable, List[dict]]) -> "MarksFrame":
+        """Итоговые оценки: {ученик: результат get_control_marks}"""
+
+        return cls(
+            [
+                (student, period["period"], subject["subject_id"], value, 1.0)
+                for student, control_marks in students.items()
+                for period in control_marks
+                for subject in period.get("marks") or ()
+                for value in [parse_mark(subject.get("mark"))]
+            ]
+        )
+
+    @classmethod
+    def from_all_marks(
+        cls, students: Dict[Hashable, Dict[int, Dict[int, Any]]]
+    ) -> "MarksFrame":
+        """Все оценки: {ученик: результат get_all_marks_bulk}
+        Вес оценки берётся из поля weight, если оно есть"""
+
+        return cls(
+            [
+                (
+                    student,
+                    period,
+                    subject_id,
+                    parse_mark(record["mark"]),
+                    float(record.get("weight") or 1),
+                )
+                for student, periods in students.items()
+                for period, subjects in periods.items()
+                for subject_id, data in subjects.items()
+                for record in mark_records(data)
+            ]
+        )
+
+    def _groups(self, by: Sequence[str]):
+        """Возвращает уникальные группы (по строкам) и номер группы каждой оценки"""
+
+        np = _numpy()
+        keys = np.stack([getattr(self, column) for column in by], axis=1)
+        groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+        return groups, inverse.reshape(-1)
+
+    def _labels(self, by: Sequence[str], groups) -> List[tuple]:
+        labels = []
+        for row in groups.tolist():
+            labels.append(
+                tuple(
+                    self.students[v] if column == "student" else v
+                    for column, v in zip(by, row)
+                )
+            )
+        return labels
+
+    def counts(self, by: Sequence[str] = ("student", "subject_id")) -> Dict[tuple, int]:
+        """Количество оценок по группам"""
+
+        np = _numpy()
+        groups, inverse = self._groups(by)
+        return dict(zip(self._labels(by, groups), np.bincount(inverse).tolist()))
+
+    def averages(
+        self, by: Sequence[str] = ("student", "subject_id")
+    ) -> Dict[tuple, float]:
+        """Средний балл по группам, например ('student', 'subject_id')"""
+
+        np = _numpy()
+        groups, inverse = self._groups(by)
+        sums = np.bincount(inverse, weights=self.value)
+        return dict(
+            zip(self._labels(by, groups), (sums / np.bincount(inverse)).tolist())
+        )
+
+    def weighted_averages(
+        self, by: Sequence[str] = ("student", "subject_id")
+    ) -> Dict[tuple, float]:
+        """Средневзвешенный балл по группам"""
+
+        np = _numpy()
+        groups, inverse = self._groups(by)
+        sums = np.bincount(inverse, weights=self.value * self.weight)
+        weights = np.bincount(inverse, weights=self.weight)
+        return dict(zip(self._labels(by, groups), (sums / weights).tolist()))
+
+    def mark_counts(
+        self, by: Sequence[str] = ("student", "subject_id")
+    ) -> Dict[tuple, Dict[float, int]]:
+        """Количество каждой оценки по группам: {группа: {5.0: 3, 4.0: 1}}"""
+
+        np = _numpy()
+        groups, inverse = self._groups(by)
+        values, value_codes = np.unique(self.value, return_inverse=True)
+        table = np.zeros((len(groups), len(values)), np.int64)
+        np.add.at(table, (inverse, value_codes.reshape(-1)), 1)
+        values = values.tolist()
+        return {
+            label: {values[i]: count for i, count in enumerate(row) if count}
+            for label, row in zip(self._labels(by, groups), table.tolist())
+        }
+
+    def period_deltas(self) -> Dict[tuple, float]:
+        """Изменение среднего балла ученика по предмету относительно прошлого периода
+        Ключ - (ученик, предмет, период), первый период по предмету пропускается"""
+
+        np = _numpy()
+        by = ("student", "subject_id", "period")
+        groups, inverse = self._groups(by)
+        means = np.bincount(inverse, weights=self.value) / np.bincount(inverse)
+        # np.unique сортирует группы, поэтому периоды одного предмета идут подряд
+        same = np.all(groups[1:, :2] == groups[:-1, :2], axis=1)
+        deltas = means[1:] - means[:-1]
+        labels = self._labels(by, groups[1:][same])
+        return dict(zip(labels, deltas[same].tolist()))
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from collections import OrderedDict
+from threading import Lock, local
+from typing import Any, Dict, Hashable, Optional, Tuple
+import hashlib
+import json
+import time
+
+# Время жизни ответов (в секундах) для редко меняющихся методов
+DEFAULT_TTLS = {
+    "guide/": 24 * 60 * 60,  # get_guide
+    "ios/": 24 * 60 * 60,  # get_useful_links
+    "do/cert/": 60 * 60,  # get_certificate
+    "odnoklassniki/": 60 * 60,  # get_classmates
+    "mail/new/": 60 * 60,  # get_recipients
+}
+
+
+def endpoint(target: str) -> str:
+    """Возвращает путь запроса без параметров: 'guide/?child=1' -> 'guide/'"""
+
+    return target.split("?", 1)[0]
+
+
+class TTLCache(object):
+    """Кэш ответов в памяти с временем жизни записей и вытеснением LRU
+    Один экземпляр можно передать нескольким Ruobr и AsyncRuobr"""
+
+    def __init__(self, maxsize: int = 1024, ttls: Dict[str, float] = None):
+        self.maxsize = maxsize
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # ключ -> (время истечения, ответ)
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def ttl(self, target: str) -> float:
+        """Возвращает время жизни ответа для запроса, 0 - не кэшировать"""
+
+        return self.ttls.get(endpoint(target), 0)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Возвращает сохранённый ответ или None"""
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                if item[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, str, str]]:
+        """Возвращает устаревший ответ и его валидаторы (ETag, Last-Modified)
+        В памяти валидаторы не хранятся, поэтому всегда None"""
+
+        return None
+
+    def refresh(self, key: Hashable, ttl: float):
+        """Продлевает жизнь записи после ответа 304 Not Modified"""
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: float,
+        etag: str = None,
+        last_modified: str = None,
+    ):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, username: str = None, target: str = None):
+        """Удаляет записи аккаунта и/или запроса, без аргументов - все записи
+        target может быть как полным запросом, так и путём без параметров"""
+
+        with self._lock:
+            if username is None and target is None:
+                self._data.clear()
+                return
+            for key in list(self._data):
+                if username is not None and key[0] != username:
+                    continue
+                if target is not None and target not in (key[2], endpoint(key[2])):
+                    continue
+                del self._data[key]
+
+    def clear(self):
+        self.invalidate()
+        self.hits = 0
+        self.misses = 0
+
+
+class SQLiteCache(TTLCache):
+    """Кэш ответов в файле SQLite, переживает перезапуск процесса
+    Хранит ETag/Last-Modified, чтобы устаревший ответ можно было проверить
+    условным запросом вместо полной загрузки. Файл можно использовать из
+    нескольких процессов: SQLite сам блокирует запись, а журнал WAL не мешает
+    читателям. При превышении maxsize записей или max_bytes удаляются давно
+    не использованные, пока не останется 90% лимита.
+    Время обращения обновляется не чаще раза в touch_interval секунд, чтобы
+    чтение не требовало записи в файл. Размер кэша считается в процессе и
+    сверяется с файлом раз в check_every записей или при превышении лимита"""
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 100000,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttls: Dict[str, float] = None,
+        touch_interval: float = 60.0,
+        check_every: int = 1000,
+    ):
+        super().__init__(maxsize, ttls)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.check_every = check_every
+        self._local = local()  # Соединения SQLite нельзя делить между потоками
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    username TEXT,
+                    target TEXT,
+                    endpoint TEXT,
+                    body TEXT,
+                    size INTEGER,
+                    fetched REAL,
+                    expires REAL,
+                    accessed REAL,
+                    etag TEXT,
+                    last_modified TEXT
+                )""")
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            if db.execute("PRAGMA user_version").fetchone()[0] < 1:
+                # Файлы прошлых версий хранили логин в base64, заменяем его хэшем
+                db.create_function("account", 1, self._account)
+                db.execute("UPDATE responses SET username = account(username)")
+                db.execute("PRAGMA user_version = 1")
+            # Оценка числа и размера записей сверху: повторная запись ключа
+            # и записи других процессов учитываются при сверке с файлом
+            self._count, self._size = self._totals(db)
+        self._writes = 0
+
+    def _db(self) -> "sqlite3.Connection":
+        db = getattr(self._local, "db", None)
+        if db is None:
+            import sqlite3
+
+            db = sqlite3.connect(self.path, timeout=30)
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _hash(key: Hashable) -> str:
+        # В ключе есть пароль, поэтому в файл попадает только хэш
+        return hashlib.sha256(json.dumps(list(key)).encode("UTF-8")).hexdigest()
+
+    @staticmethod
+    def _account(username: str) -> str:
+        # Логин в base64 легко раскодировать, поэтому хранится его хэш
+        return hashlib.sha256(username.encode("UTF-8")).hexdigest()
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        row = (
+            self._db()
+            .execute(
+                "SELECT body, accessed FROM responses WHERE key = ? AND expires > ?",
+                (self._hash(key), now),
+            )
+            .fetchone()
+        )
+        if row is not None and now - row[1] >= self.touch_interval:
+            with self._db() as db:
+                db.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?",
+                    (now, self._hash(key)),
+                )
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, str, str]]:
+        row = (
+            self._db()
+            .execute(
+                "SELECT body, etag, last_modified FROM responses WHERE key = ? "
+                "AND (etag IS NOT NULL OR last_modified IS NOT NULL)",
+                (self._hash(key),),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def refresh(self, key: Hashable, ttl: float):
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "UPDATE responses SET fetched = ?, expires = ?, accessed = ? "
+                "WHERE key = ?",
+                (now, now + ttl, now, self._hash(key)),
+            )
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: float,
+        etag: str = None,
+        last_modified: str = None,
+    ):
+        username, _, target = key
+        body = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._hash(key),
+                    self._account(username),
+                    target,
+                    endpoint(target),
+                    body,
+                    len(body),
+                    now,
+                    now + ttl,
+                    now,
+                    etag,
+                    last_modified,
+                ),
+            )
+            with self._lock:
+                self._count += 1
+                self._size += len(body)
+                self._writes += 1
+                check = (
+                    self._count > self.maxsize
+                    or self._size > self.max_bytes
+                    or self._writes >= self.check_every
+                )
+            if check:
+                self._evict(db)
+
+    @staticmethod
+    def _totals(db: "sqlite3.Connection") -> Tuple[int, int]:
+        return db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+    def _evict(self, db: "sqlite3.Connection"):
+        count, size = self._totals(db)
+        if count > self.maxsize or size > self.max_bytes:
+            # Удаляем давно не использованные записи с запасом, чтобы
+            # следующие записи не запускали очистку сразу же
+            max_count = self.maxsize - self.maxsize // 10
+            max_size = self.max_bytes - self.max_bytes // 10
+            keys = []
+            for key, item_size in db.execute(
+                "SELECT key, size FROM responses ORDER BY accessed"
+            ):
+                if count <= max_count and size <= max_size:
+                    break
+                keys.append((key,))
+                count -= 1
+                size -= item_size
+            db.executemany("DELETE FROM responses WHERE key = ?", keys)
+        with self._lock:
+            self._count, self._size, self._writes = count, size, 0
+
+    def invalidate(self, username: str = None, target: str = None):
+        query, params = "DELETE FROM responses WHERE 1", []
+        if username is not None:
+            query += " AND username = ?"
+            params.append(self._account(username))
+        if target is not None:
+            query += " AND (target = ? OR endpoint = ?)"
+            params += [target, target]
+        with self._db() as db:
+            db.execute(query, params)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.models import Model
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Iterable, List, NamedTuple, Tuple
+import hashlib
+import json
+
+
+class Changes(NamedTuple):
+    added: List[Any]
+    changed: List[Any]
+    removed: List[int]  # ключи удалённых записей
+    initial: bool  # True при первом опросе, когда сравнивать не с чем
+
+
+def _plain(value: Any) -> Any:
+    # Модели (typed=True) дают тот же отпечаток, что и исходные словари
+    if isinstance(value, Model):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def fingerprint(item: Any) -> int:
+    """Возвращает 64-битный отпечаток записи, не зависящий от порядка ключей"""
+
+    data = json.dumps(
+        item,
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=_plain,
+    )
+    digest = hashlib.blake2b(data.encode("UTF-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def item_key(item: Any) -> int:
+    """Ключ записи: поле id, а если его нет - отпечаток самой записи"""
+
+    if isinstance(item, (dict, Model)) and isinstance(item.get("id"), int):
+        return item["id"]
+    return fingerprint(item)
+
+
+def mark_key(item: dict) -> int:
+    """Ключ итоговой оценки: период и предмет, упакованные в одно число"""
+
+    return (item["period"] << 32) | item["subject_id"]
+
+
+class ChangeTracker(object):
+    """Отслеживает изменения между опросами: новые, изменённые и удалённые записи
+    Для каждой пары (аккаунт, вид данных) хранятся только отсортированные
+    массивы ключей и 64-битных отпечатков, то есть 16 байт на запись.
+    max_entries ограничивает число пар, давно не опрашиваемые удаляются
+
+    Пример:
+    >>> tracker = ChangeTracker()
+    >>> changes = tracker.mail('username', r.get_mail())
+    >>> if not changes.initial:
+    ...     notify(changes.added)"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries
+        self._state = OrderedDict()  # (аккаунт, вид) -> (ключи, отпечатки)
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def update(
+        self,
+        account: str,
+        kind: str,
+        items: Iterable[Any],
+        key: Callable[[Any], int] = item_key,
+    ) -> Changes:
+        """Сравнивает записи с предыдущим опросом и запоминает новое состояние
+        Сравниваются только опросы одного вида, поэтому для дневника стоит
+        каждый раз запрашивать один и тот же период"""
+
+        current = {}
+        for item in items:
+            current[key(item)] = (fingerprint(item), item)
+
+        keys = array("q", sorted(current))
+        prints = array("q", (current[k][0] for k in keys))
+        with self._lock:
+            previous = self._state.pop((account, kind), None)
+            self._state[account, kind] = (keys, prints)
+            if self.max_entries is not None and len(self._state) > self.max_entries:
+                self._state.popitem(last=False)
+
+        if previous is None:
+            return Changes([item for _, item in current.values()], [], [], True)
+
+        old = dict(zip(*previous))
+        added, changed = [], []
+        for k, (print_, item) in current.items():
+            if k not in old:
+                added.append(item)
+            elif old[k] != print_:
+                changed.append(item)
+        removed = [k for k in old if k not in current]
+        return Changes(added, changed, removed, False)
+
+    def forget(self, account: str):
+        """Удаляет сохранённое состояние аккаунта"""
+
+        with self._lock:
+            for state in [s for s in self._state if s[0] == account]:
+                del self._state[state]
+
+    def mail(self, account: str, messages: List[dict]) -> Changes:
+        """Изменения в почте (результат get_mail)"""
+
+        return self.update(account, "mail", messages)
+
+    def timetable(self, account: str, lessons: List[dict]) -> Changes:
+        """Изменения в дневнике (результат get_timetable)"""
+
+        return self.update(account, "timetable", lessons)
+
+    def control_marks(self, account: str, control_marks: List[dict]) -> Changes:
+        """Изменения итоговых оценок (результат get_control_marks)
+        Записи - оценки по предметам с добавленным полем period,
+        removed содержит пары (период, предмет)"""
+
+        items = [
+            dict(subject, period=period["period"])
+            for period in control_marks
+            for subject in period.get("marks") or ()
+        ]
+        changes = self.update(account, "controlmark", items, mark_key)
+        removed = [(k >> 32, k & 0xFFFFFFFF) for k in changes.removed]
+        return changes._replace(removed=removed)
+
+    def all_marks(
+        self, account: str, period: int, subject_id: int, marks: Any
+    ) -> Changes:
+        """Изменения оценок по предмету за период (результат get_all_marks)"""
+
+        kind, key = f"all_marks/{period}/{subject_id}", item_key
+        if isinstance(marks, dict):
+            # Оценки могут прийти словарём, тогда сравниваются его значения
+            marks = [{"field": k, "value": v} for k, v in marks.items()]
+            key = lambda item: fingerprint(item["field"])
+        return self.update(account, kind, marks, key)
+
+
+def changed_pairs(changes: Changes) -> List[Tuple[int, int]]:
+    """Пары (период, предмет) из изменений control_marks, для которых стоит
+    перезапросить get_all_marks"""
+
+    return sorted(
+        {
+            (item["period"], item["subject_id"])
+            for item in changes.added + changes.changed
+        }
+    )
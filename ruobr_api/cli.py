@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.utils import Call, normalize_call
+from typing import Iterator, List, Set, Tuple
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+import zlib
+
+# Сообщения от процессов-шардов: (вид, шард, данные)
+RESULT, DONE, EXIT, FAILED = "result", "done", "exit", "failed"
+
+
+def read_credentials(path: str) -> Iterator[Tuple[str, str]]:
+    """Читает пары (логин, пароль) из CSV-файла без заголовка
+    Пустые строки и строки, начинающиеся с #, пропускаются"""
+
+    with open(path, encoding="UTF-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].startswith("#"):
+                continue
+            yield row[0].strip(), row[1]
+
+
+def parse_call(text: str) -> Call:
+    """Разбирает вызов из командной строки: 'get_mail' или
+    'get_timetable:["2020-09-01", "2020-09-07"]' (аргументы - массив JSON)"""
+
+    name, _, args = text.partition(":")
+    if not args:
+        return name
+    args = json.loads(args)
+    if not isinstance(args, list):
+        raise ValueError(f"Аргументы {name} должны быть массивом JSON")
+    return name, tuple(args)
+
+
+def shard_of(username: str, shards: int) -> int:
+    """Номер шарда аккаунта, не зависит от порядка строк в файле"""
+
+    return zlib.crc32(username.encode("UTF-8")) % shards
+
+
+def read_checkpoint(path: str) -> Set[str]:
+    """Логины аккаунтов, полностью обработанных в прошлых запусках"""
+
+    if path is None or not os.path.exists(path):
+        return set()
+    with open(path, encoding="UTF-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _error(error: Exception) -> str:
+    return None if error is None else f"{type(error).__name__}: {error}"
+
+
+def run_shard(shard: int, args: argparse.Namespace, queue: "multiprocessing.Queue"):
+    """Обходит аккаунты своего шарда асинхронным fleet.poll
+    Строки NDJSON формируются здесь же, чтобы сериализация шла на всех ядрах.
+    Очередь к главному процессу ограничена: если вывод не успевает,
+    шард ждёт, а вместе с ним и запросы к серверу"""
+
+    import asyncio
+    from ruobr_api.exceptions import CircuitOpenException
+    from ruobr_api.fleet import httpx, poll
+    from ruobr_api.retry import RetryPolicy
+
+    # Аккаунты с сетевыми ошибками не попадают в checkpoint и повторяются
+    # при следующем запуске, ошибки сервера и авторизации - окончательные
+    transient = (httpx.TransportError, CircuitOpenException)
+
+    done = read_checkpoint(args.checkpoint)
+    calls = [parse_call(call) for call in args.call]
+    expected = len([c for c in calls if normalize_call(c)[0] != "get_user"]) + 1
+
+    def accounts():
+        for username, password in read_credentials(args.credentials):
+            if shard_of(username, args.processes) == shard and username not in done:
+                yield username, password
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        put = lambda message: loop.run_in_executor(None, queue.put, message)
+        options = {"base_url": args.base_url} if args.base_url else {}
+        if args.retries > 1:
+            options["retry"] = RetryPolicy(attempts=args.retries)
+        counts, retry = {}, set()
+        async for item in poll(
+            accounts(),
+            calls,
+            concurrency=args.concurrency,
+            per_account=args.per_account,
+            http2=args.http2,
+            **options,
+        ):
+            line = json.dumps(
+                {
+                    "username": item.username,
+                    "method": item.method,
+                    "result": item.result,
+                    "error": _error(item.error),
+                },
+                ensure_ascii=False,
+                default=str,
+            )
+            await put((RESULT, shard, (line, item.error is not None)))
+            if isinstance(item.error, transient):
+                retry.add(item.username)
+            # Аккаунт обработан, когда пришли результаты всех вызовов
+            # или не удалась авторизация
+            count = counts.pop(item.username, 0) + 1
+            failed_login = item.method == "get_user" and item.error is not None
+            if count < expected and not failed_login:
+                counts[item.username] = count
+            elif item.username in retry:
+                retry.discard(item.username)
+            else:
+                await put((DONE, shard, item.username))
+
+    try:
+        asyncio.run(main())
+    except BaseException as e:
+        queue.put((FAILED, shard, _error(e)))
+    finally:
+        queue.put((EXIT, shard, None))
+
+
+class Progress(object):
+    """Счётчики по шардам для отчёта в stderr"""
+
+    def __init__(self, shards: int):
+        self.started = time.monotonic()
+        self.accounts = [0] * shards
+        self.results = [0] * shards
+        self.errors = [0] * shards
+
+    def report(self, stream):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        parts = [
+            f"#{shard}: {a} акк., {r} рез., {e} ош., {a / elapsed:.1f} акк./с"
+            for shard, (a, r, e) in enumerate(
+                zip(self.accounts, self.results, self.errors)
+            )
+        ]
+        total = sum(self.accounts)
+        stream.write(
+            f"[{elapsed:.0f} с] всего {total} акк. ({total / elapsed:.1f}/с), "
+            + "; ".join(parts)
+            + "\n"
+        )
+        stream.flush()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="ruobr",
+        description="Опрос множества аккаунтов с выводом результатов в NDJSON",
+        epilog="Пример: ruobr accounts.csv --call get_mail "
+        '--call \'get_timetable:["2020-09-01","2020-09-07"]\' --output results/',
+    )
+    parser.add_argument("credentials", help="CSV-файл со строками логин,пароль")
+    parser.add_argument(
+        "--call",
+        action="append",
+        default=[],
+        help="метод для каждого аккаунта, можно несколько раз (по умолчанию get_user)",
+    )
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="запросов на процесс"
+    )
+    parser.add_argument("--per-account", type=int, default=4)
+    parser.add_argument("--http2", action="store_true")
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="попыток на запрос при ошибках сети и 5xx",
+    )
+    parser.add_argument("--base-url", help="адрес API, например заглушки")
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="'-' - stdout, иначе папка для файлов shard-N.ndjson",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="файл обработанных аккаунтов: при повторном запуске они пропускаются",
+    )
+    parser.add_argument(
+        "--progress",
+        type=float,
+        default=10,
+        help="период отчёта в stderr в секундах, 0 - без отчёта",
+    )
+    parser.add_argument("--buffer", type=int, default=1000, help="размер очереди")
+    args = parser.parse_args(argv)
+    args.call = args.call or ["get_user"]
+    for call in args.call:
+        parse_call(call)  # Ошибку в аргументах лучше показать до запуска
+
+    queue = multiprocessing.Queue(args.buffer)
+    workers = [
+        multiprocessing.Process(target=run_shard, args=(shard, args, queue))
+        for shard in range(args.processes)
+    ]
+    for worker in workers:
+        worker.start()
+
+    if args.output == "-":
+        outputs = [sys.stdout] * args.processes
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        outputs = [
+            open(
+                os.path.join(args.output, f"shard-{shard}.ndjson"),
+                "a",
+                encoding="UTF-8",
+            )
+            for shard in range(args.processes)
+        ]
+    checkpoint = (
+        open(args.checkpoint, "a", encoding="UTF-8") if args.checkpoint else None
+    )
+
+    progress = Progress(args.processes)
+    pending = []  # обработанные аккаунты, ещё не записанные в checkpoint
+    running, failed = args.processes, False
+    last_report = last_flush = time.monotonic()
+
+    def flush():
+        # Сначала результаты, потом checkpoint: после сбоя аккаунт
+        # может быть выведен повторно, но не потеряется
+        for output in set(outputs):
+            output.flush()
+        if checkpoint is not None and pending:
+            checkpoint.write("".join(f"{username}\n" for username in pending))
+            checkpoint.flush()
+        pending.clear()
+
+    try:
+        while running:
+            try:
+                kind, shard, data = queue.get(timeout=1)
+            except Exception:  # queue.Empty
+                if not any(worker.is_alive() for worker in workers):
+                    break  # Шард упал, не успев сообщить о завершении
+                kind = None
+            if kind == RESULT:
+                line, error = data
+                outputs[shard].write(line + "\n")
+                progress.results[shard] += 1
+                progress.errors[shard] += error
+            elif kind == DONE:
+                pending.append(data)
+                progress.accounts[shard] += 1
+            elif kind == FAILED:
+                sys.stderr.write(f"Шард {shard} завершился с ошибкой: {data}\n")
+                failed = True
+            elif kind == EXIT:
+                running -= 1
+
+            now = time.monotonic()
+            if now - last_flush >= 1:
+                flush()
+                last_flush = now
+            if args.progress and now - last_report >= args.progress:
+                progress.report(sys.stderr)
+                last_report = now
+    finally:
+        flush()
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        if args.output != "-":
+            for output in outputs:
+                output.close()
+        if checkpoint is not None:
+            checkpoint.close()
+
+    if args.progress:
+        progress.report(sys.stderr)
+    failed = failed or running > 0 or any(w.exitcode for w in workers)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,1326 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.cache import TTLCache
+from ruobr_api.decoders import Decoder, get_decoder
+from ruobr_api.models import (
+    Child,
+    Classmate,
+    ControlMarks,
+    Lesson,
+    Message,
+    typed as to_models,
+)
+from ruobr_api.ratelimit import TokenBucket
+from ruobr_api.retry import CircuitBreaker, RetryPolicy
+from ruobr_api.stream import ArrayStream
+from ruobr_api.utils import (
+    Call,
+    bounded_imap,
+    mark_pairs,
+    merge_lessons,
+    normalize_call,
+    split_range,
+    threaded_imap,
+)
+from ruobr_api.exceptions import (
+    AuthenticationException,
+    CircuitOpenException,
+    NoChildrenException,
+    NoSuccessException,
+)
+from ruobr_api._lazy import LazyModule
+import base64
+import hashlib
+import json
+import time
+import warnings
+from datetime import date, datetime
+from threading import RLock
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+
+def http2_options(http2: Union[bool, str] = True) -> dict:
+    """Параметры httpx для HTTP/2 или пустой словарь, если пакет h2 не установлен
+    Если сервер не поддерживает HTTP/2, httpx сам перейдёт на HTTP/1.1.
+    http2='h2c' - HTTP/2 без TLS для локальных серверов, например
+    ruobr_api.stub, такой клиент HTTP/1.1 не поддерживает"""
+
+    if not http2:
+        return {}
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        warnings.warn("HTTP/2 недоступен, установите httpx[http2]", RuntimeWarning)
+        return {}
+    if http2 == "h2c":
+        return {"http1": False, "http2": True}
+    return {"http2": True}
+
+
+# Тяжёлые модули импортируются только при первом запросе
+asyncio = LazyModule("asyncio")
+futures = LazyModule("concurrent.futures")
+httpx = LazyModule("httpx")
+
+BASE_URL = "https://api3d.ruobr.ru/"
+
+
+class Ruobr(object):
+    """Класс для доступа к API электронного дневника"""
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        client: "httpx.Client" = None,
+        limits: "httpx.Limits" = None,
+        timeout: "Union[float, httpx.Timeout]" = None,
+        base_url: str = BASE_URL,
+        cache: TTLCache = None,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+        limiter: TokenBucket = None,
+        hooks: Dict[str, List[Callable]] = None,
+        http2: Union[bool, str] = False,
+        typed: bool = False,
+        decoder: Union[str, Decoder] = None,
+    ):
+        # Логин и пароль должны быть закодированы в base64
+        self.username = base64.b64encode(username.upper().encode("UTF-8")).decode(
+            "UTF-8"
+        )
+        self.password = base64.b64encode(password.encode("UTF-8")).decode("UTF-8")
+
+        self.is_applicant = None  # Является ли профиль родительским
+        self.is_authorized = False  # Авторизован ли профиль
+        self.is_empty = None  # Является ли профиль пустым (без детей)
+        self.child = 0  # Номер ребёнка, если профиль родительский
+        self._children = None
+
+        self.base_url = base_url
+        # Клиент может быть общим для нескольких экземпляров,
+        # тогда закрывать его должен тот, кто его создал
+        self._client = client
+        self._own_client = client is None
+        self._limits = limits
+        self._timeout = timeout
+        self._http2 = http2  # Требует пакет h2: pip install httpx[http2]
+        self.cache = cache  # Общий кэш ответов, см. ruobr_api.cache
+        self.retry = retry  # Политика повторов, см. ruobr_api.retry
+        self.breaker = breaker  # Обычно CircuitBreaker.for_host(...)
+        self.limiter = limiter  # Общий ограничитель частоты, см. ruobr_api.ratelimit
+        # Обработчики событий запроса: request, response, error, retry, cache,
+        # revalidated (ответ 304 на условный запрос), decode
+        # Вызываются как hook(target, **info), см. ruobr_api.metrics.
+        # response получает и size - длину тела: у ответа iter_timetable
+        # тело прочитано по частям, и response.content недоступен
+        self.hooks = {event: list(h) for event, h in (hooks or {}).items()}
+        self._lock = RLock()
+        self._restored = False  # Состояние загружено через load_session
+        # Возвращать записи моделями ruobr_api.models вместо словарей
+        self.typed = typed
+        # Разбор JSON: 'orjson', 'msgspec', 'json' или функция, см. ruobr_api.decoders
+        self.decoder = decoder
+        self._loads = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _client_options(self) -> dict:
+        options = {}
+        if self._limits is not None:
+            options["limits"] = self._limits
+        if self._timeout is not None:
+            options["timeout"] = self._timeout
+        if self._http2:
+            options.update(http2_options(self._http2))
+        return options
+
+    @property
+    def client(self) -> "httpx.Client":
+        """HTTP-клиент с пулом соединений, создаётся при первом запросе"""
+
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(**self._client_options())
+        return self._client
+
+    def close(self):
+        """Закрывает соединения, если клиент был создан этим экземпляром"""
+
+        if self._own_client and self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def _check_authorized(self):
+        if not self.is_authorized:
+            self.get_user()
+
+    def _check_empty(self):
+        if self.is_empty:
+            raise NoChildrenException("На аккаунте нет детей")
+
+    @property
+    def user(self) -> dict:
+        if self.is_authorized and not self.is_empty:
+            return self._children[self.child]
+        return None
+
+    def _authorize(self, user: dict):
+        """Сохраняет данные из ответа user/"""
+
+        if not user:
+            raise AuthenticationException("Проверьте логин и/или пароль")
+        if user["status"] == "applicant":
+            children = user["childs"]
+        else:
+            children = [user]
+
+        self._children = children
+        self.is_applicant = user["status"] == "applicant"
+        self.is_empty = len(children) == 0
+        # Выставляется последним: другие потоки проверяют только этот флаг
+        self.is_authorized = True
+
+    def _relogin(self, error: Exception) -> bool:
+        """Сбрасывает восстановленную сессию, если сервер её отверг
+        Возвращает True, если нужно авторизоваться заново и повторить запрос"""
+
+        if not self._restored or isinstance(error, CircuitOpenException):
+            return False
+        with self._lock:
+            # Данные детей не сбрасываются: другие потоки могли уже пройти
+            # _check_authorized, get_user заменит их под блокировкой
+            self._restored = False
+            self.is_authorized = False
+        return True
+
+    def _account(self) -> str:
+        return hashlib.sha256(f"{self.username}:{self.password}".encode()).hexdigest()
+
+    def dump_session(self) -> bytes:
+        """Возвращает состояние авторизованного профиля
+        Его можно передать в load_session нового экземпляра, чтобы не тратить
+        запрос user/ на авторизацию"""
+
+        self._check_authorized()
+
+        return self._dump_session()
+
+    def _dump_session(self) -> bytes:
+        return json.dumps(
+            {
+                "version": 1,
+                "account": self._account(),
+                "children": self._children,
+                "is_applicant": self.is_applicant,
+                "is_empty": self.is_empty,
+                "child": self.child,
+            },
+            ensure_ascii=False,
+        ).encode("UTF-8")
+
+    def load_session(self, data: bytes):
+        """Восстанавливает состояние из dump_session без запроса к серверу
+        Если сервер отвергнет восстановленную сессию, профиль авторизуется заново"""
+
+        session = json.loads(data)
+        if session.get("version") != 1 or session["account"] != self._account():
+            raise ValueError("Сессия сохранена для другого аккаунта")
+        if not isinstance(session.get("children"), list):
+            raise ValueError("Сессия сохранена до авторизации")
+
+        with self._lock:
+            self._children = session["children"]
+            self.is_applicant = session["is_applicant"]
+            self.is_empty = session["is_empty"]
+            self.child = session["child"]
+            self._restored = True
+            self.is_authorized = True
+
+    def save_session(self, path: str):
+        """Сохраняет dump_session в файл"""
+
+        data = self.dump_session()
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def restore_session(self, path: str):
+        """Восстанавливает состояние из файла, созданного save_session"""
+
+        with open(path, "rb") as f:
+            self.load_session(f.read())
+
+    def _typed(self, model: type, data: Any) -> Any:
+        """Превращает ответ в модели, если включён режим typed"""
+
+        return to_models(model, data) if self.typed else data
+
+    def _get_child(self, child: int = None) -> dict:
+        """Возвращает ребёнка по номеру, по умолчанию выбранного в поле child
+        Номер можно передать в любой метод, не меняя поле child"""
+
+        return self._children[self.child if child is None else child]
+
+    def _cache_lookup(self, target: str) -> Tuple[Hashable, Any]:
+        """Возвращает ключ кэша и сохранённый ответ
+        Ключ равен None, если ответ на этот запрос не кэшируется"""
+
+        if self.cache is None or not self.cache.ttl(target):
+            return None, None
+        key = (self.username, self.password, target)
+        cached = self.cache.get(key)
+        self._emit("cache", target, hit=cached is not None)
+        return key, cached
+
+    def _cache_store(
+        self, key: Hashable, target: str, value: Any, response: "httpx.Response"
+    ):
+        if key is not None:
+            self.cache.set(
+                key,
+                value,
+                self.cache.ttl(target),
+                response.headers.get("etag"),
+                response.headers.get("last-modified"),
+            )
+
+    def _cache_stale(self, key: Hashable) -> Union[Tuple[Any, str, str], None]:
+        """Возвращает устаревший ответ с валидаторами для условного запроса"""
+
+        if key is None:
+            return None
+        return self.cache.get_stale(key)
+
+    @staticmethod
+    def _conditional_headers(stale: Union[Tuple[Any, str, str], None]) -> dict:
+        headers = {}
+        if stale is not None:
+            if stale[1] is not None:
+                headers["if-none-match"] = stale[1]
+            if stale[2] is not None:
+                headers["if-modified-since"] = stale[2]
+        return headers
+
+    def _revalidated(self, key: Hashable, target: str, stale, response) -> bool:
+        """Проверяет, подтвердил ли сервер, что устаревший ответ не изменился"""
+
+        if stale is None or response.status_code != 304:
+            return False
+        self.cache.refresh(key, self.cache.ttl(target))
+        # Промах уже учтён в _cache_lookup, здесь - отдельное событие
+        self._emit("revalidated", target)
+        return True
+
+    def invalidate_cache(self, target: str = None):
+        """Удаляет из кэша ответы этого аккаунта (или только на запрос target)"""
+
+        if self.cache is not None:
+            self.cache.invalidate(self.username, target)
+
+    def _request_options(self, target: str, headers: dict = None) -> dict:
+        return {
+            "url": f"{self.base_url}{target}",
+            "headers": {
+                "password": self.password,
+                "username": self.username,
+                **(headers or {}),
+            },
+        }
+
+    def _emit(self, event: str, target: str, **info):
+        for hook in self.hooks.get(event, ()):
+            hook(target, **info)
+
+    def _before_attempt(self) -> float:
+        """Возвращает время, которое нужно подождать перед отправкой запроса"""
+
+        if self.breaker is not None:
+            self.breaker.before()
+        if self.limiter is not None:
+            return self.limiter.reserve()
+        return 0
+
+    def _after_attempt(
+        self,
+        target: str,
+        attempt: int,
+        elapsed: float,
+        response: "httpx.Response" = None,
+        error: Exception = None,
+        stream: bool = False,
+    ) -> Union[float, None]:
+        """Учитывает результат попытки и возвращает задержку перед повтором
+        None означает, что повторять не нужно. Для потокового ответа
+        событие response откладывается до чтения тела, см. _stream_done"""
+
+        if error is None:
+            if not stream:
+                self._emit(
+                    "response",
+                    target,
+                    response=response,
+                    elapsed=elapsed,
+                    size=len(response.content),
+                )
+        else:
+            self._emit("error", target, error=error, elapsed=elapsed)
+        if self.breaker is not None:
+            self.breaker.record(error is None and response.status_code < 500)
+        if self.retry is None:
+            return None
+        delay = self.retry.delay(attempt, response, error)
+        if delay is not None:
+            self._emit("retry", target, attempt=attempt, delay=delay)
+        return delay
+
+    def _stream_done(self, target: str, response: "httpx.Response", size: int):
+        """Отложенное событие response потокового ответа
+        Тело уже прочитано итератором, поэтому response.content недоступен,
+        размер передаётся в size"""
+
+        elapsed = time.perf_counter() - response.extensions["ruobr_started"]
+        self._emit("response", target, response=response, elapsed=elapsed, size=size)
+
+    def _decode(self, target: str, response: "httpx.Response") -> dict:
+        started = time.perf_counter()
+        try:
+            return self._parse(response)
+        except Exception as e:
+            self._emit("error", target, error=e, elapsed=0.0)
+            raise
+        finally:
+            self._emit("decode", target, elapsed=time.perf_counter() - started)
+
+    def _parse(self, response: "httpx.Response") -> Any:
+        """Разбирает ответ и проверяет его на наличие ошибок"""
+
+        return self._parse_content(response.content)
+
+    def _get_decoder(self) -> Decoder:
+        if self._loads is None:
+            self._loads = get_decoder(self.decoder)
+        return self._loads
+
+    def _parse_content(self, content: bytes) -> Any:
+        try:
+            data = self._get_decoder()(content)
+        except Exception:
+            raise NoSuccessException(content.decode("UTF-8", "replace"))
+        # В случае ошибки возвращается словарь с success, поэтому
+        # для обычного ответа достаточно одной проверки
+        if type(data) is dict and not data.get("success", True):
+            if "error" in data:
+                raise NoSuccessException(data["error"])
+            if "error_type" in data:
+                # не уверен, что это всё ещё работает
+                if data["error_type"] == "auth":
+                    raise AuthenticationException("Проверьте логин и/или пароль")
+                raise NoSuccessException(data["error_type"])
+            raise NoSuccessException(data)
+        return data
+
+    def _send(
+        self, target: str, headers: dict = None, stream: bool = False
+    ) -> "httpx.Response":
+        """Отправляет запрос, повторяя его согласно политике retry
+        При stream=True тело ответа не загружается, его нужно прочитать и закрыть"""
+
+        options = self._request_options(target, headers)
+        attempt = 0
+        while True:
+            attempt += 1
+            wait = self._before_attempt()
+            if wait:
+                time.sleep(wait)
+            self._emit("request", target, attempt=attempt)
+            started = time.perf_counter()
+            try:
+                if stream:
+                    request = self.client.build_request("GET", **options)
+                    response = self.client.send(request, stream=True)
+                else:
+                    response = self.client.get(**options)
+            except httpx.TransportError as e:
+                elapsed = time.perf_counter() - started
+                delay = self._after_attempt(target, attempt, elapsed, error=e)
+                if delay is None:
+                    raise
+            else:
+                elapsed = time.perf_counter() - started
+                try:
+                    delay = self._after_attempt(
+                        target, attempt, elapsed, response=response, stream=stream
+                    )
+                except BaseException:
+                    if stream:
+                        response.close()
+                    raise
+                if delay is None:
+                    if stream:
+                        response.extensions["ruobr_started"] = started
+                    return response
+                if stream:
+                    response.close()
+            time.sleep(delay)
+
+    def _get(self, target: str) -> dict:
+        """Метод для получения данных"""
+
+        try:
+            return self._load(target)
+        except (AuthenticationException, NoSuccessException) as e:
+            if not self._relogin(e):
+                raise
+            self.get_user()
+        return self._load(target)
+
+    def _load(self, target: str) -> dict:
+        key, cached = self._cache_lookup(target)
+        if cached is not None:
+            return cached
+
+        stale = self._cache_stale(key)
+        response = self._send(target, self._conditional_headers(stale))
+        if self._revalidated(key, target, stale, response):
+            return stale[0]
+        result = self._decode(target, response)
+        self._cache_store(key, target, result, response)
+        return result
+
+    def get_user(self) -> dict:
+        """Авторизует и возвращает информацию об ученике
+        После авторизации информация доступна в поле user
+        Если профиль родительский, измените поле child для выбора ребёнка"""
+
+        # Блокировка нужна, чтобы потоки не авторизовались одновременно
+        with self._lock:
+            if self.user is not None:
+                return self.user
+
+            self._authorize(self._get("user/"))
+
+        return self.user
+
+    def get_children(self) -> List[dict]:
+        """Возвращает список детей текущего аккаунта (для обработки родительских аккаунтов)"""
+
+        self._check_authorized()
+
+        return self._typed(Child, self._children)
+
+    def batch(self, calls: Sequence[Call], workers: int = 8) -> List[Any]:
+        """Выполняет вызовы в пуле из workers потоков и возвращает результаты по порядку
+        Вызов - имя метода или кортеж (имя, args) / (имя, args, kwargs),
+        вместо результата неудачного вызова возвращается исключение
+        Пример: r.batch(['get_mail', ('get_guide', (), {'child': 1})])"""
+
+        self._check_authorized()
+
+        def run(call):
+            name, args, kwargs = normalize_call(call)
+            try:
+                return getattr(self, name)(*args, **kwargs)
+            except Exception as e:
+                return e
+
+        with futures.ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(run, calls))
+
+    def for_each_child(self, method: str, *args, **kwargs) -> Dict[int, Any]:
+        """Вызывает метод для каждого ребёнка параллельно и возвращает {id ребёнка: результат}
+        Пример: r.for_each_child('get_timetable', '2020-04-27', '2020-05-03')"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        func = getattr(self, method)
+        with futures.ThreadPoolExecutor(len(self._children)) as pool:
+            results = list(
+                pool.map(
+                    lambda child: func(*args, child=child, **kwargs),
+                    range(len(self._children)),
+                )
+            )
+        return {child["id"]: result for child, result in zip(self._children, results)}
+
+    def get_mail(self) -> List[dict]:
+        """Возвращает почту
+        Если в сообщении type_id == 2, то last_msg_text содержит HTML-разметку"""
+
+        self._check_authorized()
+
+        return self._typed(Message, self._get("mail/")["messages"])
+
+    def get_message(self, message_id: int, child: int = None) -> dict:
+        """Возвращает подробную информацию о сообщении
+        Падает c ошибкой 502 Bad Gateway, если в сообщении type_id == 2"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        result = self._get(f"mail/{message_id}/?child={self._get_child(child)['id']}")
+        return self._typed(Message, result["data"])
+
+    def _message_ids(self, messages, skip_types) -> List[int]:
+        """Оставляет id сообщений, которые можно загрузить через get_message"""
+
+        return [
+            m if isinstance(m, int) else m["id"]
+            for m in messages
+            if isinstance(m, int) or m.get("type_id") not in skip_types
+        ]
+
+    def get_messages(
+        self,
+        messages: Iterable[Union[int, dict]] = None,
+        workers: int = 8,
+        skip_types: Tuple[int, ...] = (2,),
+        child: int = None,
+    ) -> Iterator[Tuple[int, dict]]:
+        """Загружает сообщения параллельно и отдаёт пары (id, сообщение) по готовности
+        messages - id или сообщения из get_mail, по умолчанию вся почта
+        Сообщения с type_id из skip_types пропускаются без запроса к серверу,
+        вместо неудачного сообщения отдаётся (id, исключение), как в batch"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        if messages is None:
+            messages = self.get_mail()
+        ids = self._message_ids(messages, skip_types)
+        yield from threaded_imap(
+            lambda message_id: self.get_message(message_id, child), ids, workers
+        )
+
+    def get_recipients(self) -> List[dict]:
+        """Возвращает доступных получателей сообщения"""
+
+        self._check_authorized()
+
+        return self._get("mail/new/")["data"]
+
+    def get_achievements(self, child: int = None) -> dict:
+        """Возвращает список достижений"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"achievements/?child={self._get_child(child)['id']}")["data"]
+
+    def get_control_marks(self, child: int = None) -> List[dict]:
+        """Возвращает итоговые оценки"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        result = self._get(f"controlmark/?child={self._get_child(child)['id']}")
+        return self._typed(ControlMarks, result)
+
+    def get_all_marks(self, period: int, subject_id: int, child: int = None) -> dict:
+        """Возвращает все оценки по предмету за период. Может быть пустым"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(
+            f"all_marks/{period}/{subject_id}/?child={self._get_child(child)['id']}"
+        )["data"]
+
+    def get_all_marks_bulk(
+        self, workers: int = 8, child: int = None
+    ) -> Dict[int, Dict[int, dict]]:
+        """Возвращает все оценки по всем предметам и периодам: {период: {предмет: оценки}}
+        Запросы get_all_marks выполняются параллельно, не более workers одновременно"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        pairs = mark_pairs(self.get_control_marks(child))
+        with futures.ThreadPoolExecutor(workers) as pool:
+            marks = list(
+                pool.map(lambda pair: self.get_all_marks(*pair, child=child), pairs)
+            )
+
+        result = {}
+        for (period, subject_id), data in zip(pairs, marks):
+            result.setdefault(period, {})[subject_id] = data
+        return result
+
+    def get_events(self, child: int = None) -> dict:
+        """Возвращает события"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"btm/?child={self._get_child(child)['id']}")
+
+    def get_certificate(self, child: int = None) -> dict:
+        """Возвращает информацию о сертификате"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"do/cert/?child={self._get_child(child)['id']}")["data"]
+
+    def get_birthdays(self, child: int = None) -> List[dict]:
+        """Возвращает дни рождения"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"birthday/?child={self._get_child(child)['id']}")["data"]
+
+    def get_food_info(
+        self, _date: Union[str, date, datetime] = None, child: int = None
+    ) -> dict:
+        """Возвращает информацию о питании. Может быть пустым"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        if _date is None:
+            _date = datetime.now()
+
+        if isinstance(_date, (date, datetime)):
+            _date = _date.strftime("%Y-%m-%d")
+
+        return self._get(
+            f"food/calendary/?child={self._get_child(child)['id']}&food_type={self._get_child(child)['school_is_food']}&selected_date={_date}&food_menu_complex=1"
+        )["data"]
+
+    def get_classmates(self, child: int = None) -> List[dict]:
+        """Возвращает информацию об одноклассниках"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        result = self._get(f"odnoklassniki/?child={self._get_child(child)['id']}")
+        return self._typed(Classmate, result["data"])
+
+    def get_books(self, child: int = None) -> List[dict]:
+        """Возвращает информацию о взятых книгах"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"book/?child={self._get_child(child)['id']}")["data"]
+
+    def get_useful_links(self, child: int = None) -> dict:
+        """Возвращает полезные ссылки"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"ios/?child={self._get_child(child)['id']}")["data"]
+
+    def get_guide(self, child: int = None) -> dict:
+        """Возвращает информацию об учебном заведении"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        return self._get(f"guide/?child={self._get_child(child)['id']}")["data"]
+
+    def _timetable_target(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        child: int = None,
+    ) -> str:
+        if isinstance(start, (date, datetime)):
+            start = start.strftime("%Y-%m-%d")
+        if isinstance(end, (date, datetime)):
+            end = end.strftime("%Y-%m-%d")
+
+        return (
+            f"timetable2/?start={start}&end={end}&child={self._get_child(child)['id']}"
+        )
+
+    def get_timetable(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        child: int = None,
+    ) -> List[dict]:
+        """Возвращает дневник целиком
+        Пример даты: '2020-04-27'"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        result = self._get(self._timetable_target(start, end, child))
+        return self._typed(Lesson, result["lessons"])
+
+    def iter_timetable(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        child: int = None,
+    ) -> Iterator[dict]:
+        """Отдаёт уроки дневника по одному, разбирая ответ по мере получения
+        Память не растёт с длиной периода, поэтому уроки можно сразу
+        записывать в файл или базу. Кэш не используется
+
+        Пример:
+        >>> for lesson in r.iter_timetable('2020-09-01', '2021-05-31'):
+        ...     db.insert(lesson)"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        target = self._timetable_target(start, end, child)
+        parser = ArrayStream("lessons")
+        response = self._send(target, stream=True)
+        size = 0
+        try:
+            for chunk in response.iter_bytes():
+                size += len(chunk)
+                for item in parser.feed(chunk):
+                    yield self._typed(Lesson, item)
+                if parser.done:
+                    return
+        finally:
+            response.close()
+            self._stream_done(target, response, size)
+        if parser.found:
+            raise NoSuccessException("Ответ сервера оборвался")
+        # Массива нет - значит, сервер вернул ошибку
+        self._parse_content(bytes(parser.buffer))
+
+    def get_timetable_range(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        window: str = "week",
+        workers: int = 4,
+        retries: int = 2,
+        child: int = None,
+    ) -> List[dict]:
+        """Возвращает дневник за длинный период, загружая его частями параллельно
+        window - 'week' или 'month', неудачная часть перезапрашивается до retries раз
+        Результат совпадает с get_timetable(start, end)"""
+
+        self._check_authorized()
+        self._check_empty()
+
+        def fetch(window):
+            for attempt in range(retries + 1):
+                try:
+                    return self.get_timetable(*window, child=child)
+                except (httpx.HTTPError, NoSuccessException):
+                    if attempt == retries:
+                        raise
+
+        with futures.ThreadPoolExecutor(workers) as pool:
+            chunks = list(pool.map(fetch, split_range(start, end, window)))
+        return merge_lessons(chunks)
+
+
+class AsyncRuobr(Ruobr):
+    """Класс для доступа к новому API электронного дневника"""
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        client: "httpx.AsyncClient" = None,
+        limits: "httpx.Limits" = None,
+        timeout: "Union[float, httpx.Timeout]" = None,
+        base_url: str = BASE_URL,
+        cache: TTLCache = None,
+        retry: RetryPolicy = None,
+        breaker: CircuitBreaker = None,
+        limiter: TokenBucket = None,
+        hooks: Dict[str, List[Callable]] = None,
+        http2: Union[bool, str] = False,
+        typed: bool = False,
+        decoder: Union[str, Decoder] = None,
+    ):
+        super().__init__(
+            username,
+            password,
+            client,
+            limits,
+            timeout,
+            base_url,
+            cache,
+            retry,
+            breaker,
+            limiter,
+            hooks,
+            http2,
+            typed,
+            decoder,
+        )
+        self._inflight = {}  # type: Dict[str, asyncio.Future]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError("Используйте async with")
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """HTTP-клиент с пулом соединений, создаётся при первом запросе"""
+
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.AsyncClient(**self._client_options())
+        return self._client
+
+    async def close(self):
+        """Закрывает соединения, если клиент был создан этим экземпляром"""
+
+        if self._own_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _check_authorized(self):
+        if not self.is_authorized:
+            await self.get_user()
+
+    async def dump_session(self) -> bytes:
+        """Возвращает состояние авторизованного профиля, см. Ruobr.dump_session"""
+
+        await self._check_authorized()
+
+        return self._dump_session()
+
+    async def save_session(self, path: str):
+        """Сохраняет dump_session в файл"""
+
+        data = await self.dump_session()
+        with open(path, "wb") as f:
+            f.write(data)
+
+    async def _send(
+        self, target: str, headers: dict = None, stream: bool = False
+    ) -> "httpx.Response":
+        """Отправляет запрос, повторяя его согласно политике retry
+        При stream=True тело ответа не загружается, его нужно прочитать и закрыть"""
+
+        options = self._request_options(target, headers)
+        attempt = 0
+        while True:
+            attempt += 1
+            wait = self._before_attempt()
+            if wait:
+                await asyncio.sleep(wait)
+            self._emit("request", target, attempt=attempt)
+            started = time.perf_counter()
+            try:
+                if stream:
+                    request = self.client.build_request("GET", **options)
+                    response = await self.client.send(request, stream=True)
+                else:
+                    response = await self.client.get(**options)
+            except httpx.TransportError as e:
+                elapsed = time.perf_counter() - started
+                delay = self._after_attempt(target, attempt, elapsed, error=e)
+                if delay is None:
+                    raise
+            else:
+                elapsed = time.perf_counter() - started
+                try:
+                    delay = self._after_attempt(
+                        target, attempt, elapsed, response=response, stream=stream
+                    )
+                except BaseException:
+                    if stream:
+                        await response.aclose()
+                    raise
+                if delay is None:
+                    if stream:
+                        response.extensions["ruobr_started"] = started
+                    return response
+                if stream:
+                    await response.aclose()
+            await asyncio.sleep(delay)
+
+    def _release(self, target: str, future: "asyncio.Future"):
+        del self._inflight[target]
+        if not future.cancelled():
+            future.exception()  # Ошибку уже получили ожидающие, не логируем её
+
+    async def _get(self, target: str) -> dict:
+        """Метод для получения данных
+        Одновременные одинаковые запросы объединяются в один: все вызывающие
+        получают один и тот же результат или исключение"""
+
+        future = self._inflight.get(target)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(target))
+            self._inflight[target] = future
+            future.add_done_callback(lambda f: self._release(target, f))
+        # shield: отмена одного из ожидающих не отменяет запрос для остальных
+        return await asyncio.shield(future)
+
+    async def _fetch(self, target: str) -> dict:
+        try:
+            return await self._load(target)
+        except (AuthenticationException, NoSuccessException) as e:
+            if not self._relogin(e):
+                raise
+            await self.get_user()
+        return await self._load(target)
+
+    async def _load(self, target: str) -> dict:
+        key, cached = self._cache_lookup(target)
+        if cached is not None:
+            return cached
+
+        stale = self._cache_stale(key)
+        response = await self._send(target, self._conditional_headers(stale))
+        if self._revalidated(key, target, stale, response):
+            return stale[0]
+        result = self._decode(target, response)
+        self._cache_store(key, target, result, response)
+        return result
+
+    async def get_user(self) -> dict:
+        """Авторизует и возвращает информацию об ученике
+        После авторизации информация доступна в поле user
+        Если профиль родительский, измените поле child для выбора ребёнка"""
+
+        if self.user is not None:
+            return self.user
+
+        self._authorize(await self._get("user/"))
+
+        return self.user
+
+    async def get_children(self) -> List[dict]:
+        """Возвращает список детей текущего аккаунта (для обработки родительских аккаунтов)"""
+
+        await self._check_authorized()
+
+        return self._typed(Child, self._children)
+
+    async def batch(self, calls: Sequence[Call], workers: int = 8) -> List[Any]:
+        """Выполняет вызовы, не больше workers одновременно, и возвращает результаты по порядку
+        Вызов - имя метода или кортеж (имя, args) / (имя, args, kwargs),
+        вместо результата неудачного вызова возвращается исключение"""
+
+        await self._check_authorized()
+
+        limit = asyncio.Semaphore(workers)
+
+        async def run(call):
+            name, args, kwargs = normalize_call(call)
+            async with limit:
+                try:
+                    return await getattr(self, name)(*args, **kwargs)
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*[run(call) for call in calls])
+
+    async def for_each_child(self, method: str, *args, **kwargs) -> Dict[int, Any]:
+        """Вызывает метод для каждого ребёнка параллельно и возвращает {id ребёнка: результат}
+        Пример: await r.for_each_child('get_timetable', '2020-04-27', '2020-05-03')"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        func = getattr(self, method)
+        results = await asyncio.gather(
+            *[
+                func(*args, child=child, **kwargs)
+                for child in range(len(self._children))
+            ]
+        )
+        return {child["id"]: result for child, result in zip(self._children, results)}
+
+    async def get_mail(self) -> List[dict]:
+        """Возвращает почту
+        Если в сообщении type_id == 2, то last_msg_text содержит HTML-разметку"""
+
+        await self._check_authorized()
+
+        result = await self._get("mail/")
+        return self._typed(Message, result["messages"])
+
+    async def get_message(self, message_id: int, child: int = None) -> dict:
+        """Возвращает подробную информацию о сообщении
+        Падает, если в сообщении type_id == 2"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(
+            f"mail/{message_id}/?child={self._get_child(child)['id']}"
+        )
+        return self._typed(Message, result["data"])
+
+    async def get_messages(
+        self,
+        messages: Iterable[Union[int, dict]] = None,
+        workers: int = 8,
+        skip_types: Tuple[int, ...] = (2,),
+        child: int = None,
+    ) -> AsyncIterator[Tuple[int, dict]]:
+        """Загружает сообщения параллельно и отдаёт пары (id, сообщение) по готовности
+        messages - id или сообщения из get_mail, по умолчанию вся почта
+        Сообщения с type_id из skip_types пропускаются без запроса к серверу,
+        вместо неудачного сообщения отдаётся (id, исключение), как в batch"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        if messages is None:
+            messages = await self.get_mail()
+        ids = self._message_ids(messages, skip_types)
+        async for item in bounded_imap(
+            lambda message_id: self.get_message(message_id, child), ids, workers
+        ):
+            yield item
+
+    async def get_recipients(self) -> List[dict]:
+        """Возвращает доступных получателей сообщения"""
+        # TODO: возможность отправки сообщений
+
+        await self._check_authorized()
+
+        result = await self._get("mail/new/")
+        return result["data"]
+
+    async def get_achievements(self, child: int = None) -> dict:
+        """Возвращает список достижений"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"achievements/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_control_marks(self, child: int = None) -> List[dict]:
+        """Возвращает итоговые оценки"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"controlmark/?child={self._get_child(child)['id']}")
+        return self._typed(ControlMarks, result)
+
+    async def get_all_marks(
+        self, period: int, subject_id: int, child: int = None
+    ) -> dict:
+        """Возвращает все оценки по предмету за период. Может быть пустым"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(
+            f"all_marks/{period}/{subject_id}/?child={self._get_child(child)['id']}"
+        )
+        return result["data"]
+
+    async def get_all_marks_bulk(
+        self, workers: int = 8, child: int = None
+    ) -> Dict[int, Dict[int, dict]]:
+        """Возвращает все оценки по всем предметам и периодам: {период: {предмет: оценки}}
+        Запросы get_all_marks выполняются параллельно, не более workers одновременно"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        pairs = mark_pairs(await self.get_control_marks(child))
+        limit = asyncio.Semaphore(workers)
+
+        async def fetch(pair):
+            async with limit:
+                return await self.get_all_marks(*pair, child=child)
+
+        marks = await asyncio.gather(*[fetch(pair) for pair in pairs])
+
+        result = {}
+        for (period, subject_id), data in zip(pairs, marks):
+            result.setdefault(period, {})[subject_id] = data
+        return result
+
+    async def get_events(self, child: int = None) -> dict:
+        """Возвращает события"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        return await self._get(f"btm/?child={self._get_child(child)['id']}")
+
+    async def get_certificate(self, child: int = None) -> dict:
+        """Возвращает информацию о сертификате"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"do/cert/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_birthdays(self, child: int = None) -> List[dict]:
+        """Возвращает дни рождения"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"birthday/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_food_info(
+        self, _date: Union[str, date, datetime] = None, child: int = None
+    ) -> dict:
+        """Возвращает информацию о питании. Может быть пустым"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        if _date is None:
+            _date = datetime.now()
+
+        if isinstance(_date, (date, datetime)):
+            _date = _date.strftime("%Y-%m-%d")
+
+        result = await self._get(
+            f"food/calendary/?child={self._get_child(child)['id']}&food_type={self._get_child(child)['school_is_food']}&selected_date={_date}&food_menu_complex=1"
+        )
+        return result["data"]
+
+    async def get_classmates(self, child: int = None) -> List[dict]:
+        """Возвращает информацию об одноклассниках"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"odnoklassniki/?child={self._get_child(child)['id']}")
+        return self._typed(Classmate, result["data"])
+
+    async def get_books(self, child: int = None) -> List[dict]:
+        """Возвращает информацию о взятых книгах"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"book/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_useful_links(self, child: int = None) -> dict:
+        """Возвращает полезные ссылки"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"ios/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_guide(self, child: int = None) -> dict:
+        """Возвращает информацию об учебном заведении"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(f"guide/?child={self._get_child(child)['id']}")
+        return result["data"]
+
+    async def get_timetable(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        child: int = None,
+    ) -> List[dict]:
+        """Возвращает дневник целиком
+        Пример даты: '2020-04-27'"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        result = await self._get(self._timetable_target(start, end, child))
+        return self._typed(Lesson, result["lessons"])
+
+    async def iter_timetable(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        child: int = None,
+    ) -> AsyncIterator[dict]:
+        """Отдаёт уроки дневника по одному, разбирая ответ по мере получения
+
+        Пример:
+        >>> async for lesson in r.iter_timetable('2020-09-01', '2021-05-31'):
+        ...     await db.insert(lesson)"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        target = self._timetable_target(start, end, child)
+        parser = ArrayStream("lessons")
+        response = await self._send(target, stream=True)
+        size = 0
+        try:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                for item in parser.feed(chunk):
+                    yield self._typed(Lesson, item)
+                if parser.done:
+                    return
+        finally:
+            await response.aclose()
+            self._stream_done(target, response, size)
+        if parser.found:
+            raise NoSuccessException("Ответ сервера оборвался")
+        self._parse_content(bytes(parser.buffer))
+
+    async def get_timetable_range(
+        self,
+        start: Union[str, date, datetime],
+        end: Union[str, date, datetime],
+        window: str = "week",
+        workers: int = 4,
+        retries: int = 2,
+        child: int = None,
+    ) -> List[dict]:
+        """Возвращает дневник за длинный период, загружая его частями параллельно
+        window - 'week' или 'month', неудачная часть перезапрашивается до retries раз
+        Результат совпадает с get_timetable(start, end)"""
+
+        await self._check_authorized()
+        self._check_empty()
+
+        limit = asyncio.Semaphore(workers)
+
+        async def fetch(window):
+            async with limit:
+                for attempt in range(retries + 1):
+                    try:
+                        return await self.get_timetable(*window, child=child)
+                    except (httpx.HTTPError, NoSuccessException):
+                        if attempt == retries:
+                            raise
+
+        chunks = await asyncio.gather(
+            *[fetch(w) for w in split_range(start, end, window)]
+        )
+        return merge_lessons(chunks)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from typing import Any, Callable, Union
+import json
+
+Decoder = Callable[[bytes], Any]
+
+
+def _orjson() -> Decoder:
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec() -> Decoder:
+    import msgspec
+
+    return msgspec.json.Decoder().decode
+
+
+def _json() -> Decoder:
+    return json.loads
+
+
+# Порядок выбора, если декодер не указан: от самого быстрого к стандартному
+BACKENDS = {"orjson": _orjson, "msgspec": _msgspec, "json": _json}
+
+_default = None
+
+
+def get_decoder(name: Union[str, Decoder] = None) -> Decoder:
+    """Возвращает функцию, разбирающую JSON из байтов ответа
+    name - 'orjson', 'msgspec', 'json' или своя функция;
+    по умолчанию берётся первый установленный пакет из BACKENDS"""
+
+    global _default
+    if callable(name):
+        return name
+    if name is not None:
+        if name not in BACKENDS:
+            raise ValueError(f"Неизвестный декодер JSON: {name}")
+        return BACKENDS[name]()
+    if _default is None:
+        for backend in BACKENDS.values():
+            try:
+                _default = backend()
+                break
+            except ImportError:
+                continue
+    return _default
@@ -19,3 +19,7 @@ class NoChildrenException(Exception):
 class NoSuccessException(Exception):
     def __init__(self, text):
         self.text = text
+
+
+class CircuitOpenException(NoSuccessException):
+    """Сервер недавно не отвечал, запрос не отправлялся"""
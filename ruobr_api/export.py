@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.utils import mark_records, parse_mark
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import json
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Для экспорта нужен pyarrow: pip install ruobr_api[export]"
+        ) from None
+    return pyarrow
+
+
+def _text(value: Any) -> str:
+    """Строковое поле урока: вложенные объекты (например, task) хранятся как JSON"""
+
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, sort_keys=True)
+
+
+# (столбец, тип, получение значения из записи)
+# Повторяющиеся строки (предметы, учителя) кодируются словарём
+LESSON_COLUMNS = [
+    ("student", "int64", lambda student, lesson: student),
+    ("id", "int64", lambda student, lesson: lesson.get("id")),
+    ("date", "date32", lambda student, lesson: lesson.get("date")),
+    ("time_start", "string", lambda student, lesson: lesson.get("time_start")),
+    ("time_end", "string", lambda student, lesson: lesson.get("time_end")),
+    ("subject", "dictionary", lambda student, lesson: lesson.get("subject")),
+    ("staff", "dictionary", lambda student, lesson: _text(lesson.get("staff"))),
+    ("topic", "string", lambda student, lesson: _text(lesson.get("topic"))),
+    ("task", "string", lambda student, lesson: _text(lesson.get("task"))),
+]
+
+MARK_COLUMNS = [
+    ("student", "int64", lambda student, period, subject, record: student),
+    ("period", "int32", lambda student, period, subject, record: period),
+    ("subject_id", "int64", lambda student, period, subject, record: subject),
+    (
+        "mark",
+        "dictionary",
+        lambda student, period, subject, record: _text(record.get("mark")),
+    ),
+    (
+        "value",
+        "float64",
+        lambda student, period, subject, record: parse_mark(record.get("mark")),
+    ),
+    (
+        "weight",
+        "float64",
+        lambda student, period, subject, record: float(record.get("weight") or 1),
+    ),
+    ("date", "string", lambda student, period, subject, record: record.get("date")),
+]
+
+
+def _type(name: str):
+    pa = _pyarrow()
+    if name == "dictionary":
+        return pa.dictionary(pa.int32(), pa.string())
+    return getattr(pa, name)()
+
+
+def _schema(columns: List[tuple]) -> "pyarrow.Schema":
+    pa = _pyarrow()
+    return pa.schema([pa.field(name, _type(kind)) for name, kind, _ in columns])
+
+
+def lesson_schema() -> "pyarrow.Schema":
+    """Схема уроков для lesson_batches"""
+
+    return _schema(LESSON_COLUMNS)
+
+
+def mark_schema() -> "pyarrow.Schema":
+    """Схема оценок для mark_batches"""
+
+    return _schema(MARK_COLUMNS)
+
+
+def _batches(
+    columns: List[tuple], rows: Iterable[tuple], batch_size: int
+) -> Iterator["pyarrow.RecordBatch"]:
+    pa = _pyarrow()
+    schema = _schema(columns)
+    getters = [getter for _, _, getter in columns]
+
+    def build(values):
+        arrays = []
+        for (name, kind, _), column in zip(columns, values):
+            if kind == "dictionary":
+                arrays.append(pa.array(column, pa.string()).dictionary_encode())
+            elif kind == "date32":
+                # Даты приходят строками '2020-04-27', Arrow разбирает их сам
+                arrays.append(pa.array(column, pa.string()).cast(pa.date32()))
+            else:
+                arrays.append(pa.array(column, _type(kind)))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    # В памяти одновременно находится не больше batch_size записей в виде объектов
+    values = [[] for _ in columns]
+    for row in rows:
+        for column, getter in zip(values, getters):
+            column.append(getter(*row))
+        if len(values[0]) >= batch_size:
+            yield build(values)
+            values = [[] for _ in columns]
+    if values[0]:
+        yield build(values)
+
+
+def lesson_batches(
+    lessons: Iterable[Tuple[int, dict]], batch_size: int = 65536
+) -> Iterator["pyarrow.RecordBatch"]:
+    """Превращает уроки в пакеты Arrow со схемой lesson_schema()
+    lessons - пары (id ученика, урок из get_timetable), подойдёт генератор
+
+    Пример:
+    >>> rows = (
+    ...     (c['id'], l)
+    ...     for i, c in enumerate(r.get_children())
+    ...     for l in r.get_timetable(s, e, child=i)
+    ... )
+    >>> write_parquet('lessons.parquet', lesson_batches(rows), lesson_schema())"""
+
+    return _batches(LESSON_COLUMNS, lessons, batch_size)
+
+
+def mark_rows(
+    students: Dict[int, Dict[int, Dict[int, Any]]],
+) -> Iterator[Tuple[int, int, int, dict]]:
+    """Записи (ученик, период, предмет, оценка) из {ученик: get_all_marks_bulk}"""
+
+    for student, periods in students.items():
+        for period, subjects in periods.items():
+            for subject_id, data in subjects.items():
+                for record in mark_records(data):
+                    yield student, period, subject_id, record
+
+
+def mark_batches(
+    marks: Iterable[Tuple[int, int, int, dict]], batch_size: int = 65536
+) -> Iterator["pyarrow.RecordBatch"]:
+    """Превращает оценки в пакеты Arrow со схемой mark_schema()
+    marks - записи (id ученика, период, предмет, оценка), например mark_rows()"""
+
+    return _batches(MARK_COLUMNS, marks, batch_size)
+
+
+def write_parquet(
+    path: str,
+    batches: Iterable["pyarrow.RecordBatch"],
+    schema: "pyarrow.Schema",
+    compression: str = "zstd",
+) -> int:
+    """Записывает пакеты в файл Parquet по одному, возвращает число строк"""
+
+    _pyarrow()
+    import pyarrow.parquet as pq
+
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
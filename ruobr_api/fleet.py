@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.client import AsyncRuobr, asyncio, http2_options, httpx
+from ruobr_api.utils import Call, normalize_call
+from typing import Any, AsyncIterator, Iterable, NamedTuple, Sequence, Tuple, Union
+
+
+class FleetResult(NamedTuple):
+    username: str
+    method: str
+    result: Any
+    error: Exception
+
+
+async def poll(
+    credentials: Iterable[Tuple[str, str]],
+    calls: Sequence[Call],
+    concurrency: int = 50,
+    per_account: int = 4,
+    client: "httpx.AsyncClient" = None,
+    http2: Union[bool, str] = False,
+    **options,
+) -> AsyncIterator[FleetResult]:
+    """Авторизует каждый аккаунт и выполняет для него вызовы calls
+    Не более concurrency запросов всего и per_account запросов на аккаунт
+    Результаты отдаются по мере готовности, ошибки не прерывают обход
+    options передаются в конструктор AsyncRuobr (например, cache)
+    http2 включает мультиплексирование запросов в общем клиенте
+
+    Пример:
+    >>> async for r in poll([('user', 'pass')], ['get_mail']):
+    ...     print(r.username, r.method, r.result)"""
+
+    calls = [normalize_call(call) for call in calls]
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            ),
+            **http2_options(http2),
+        )
+
+    accounts = iter(credentials)
+    requests = asyncio.Semaphore(concurrency)
+    # Очередь ограничена, чтобы медленный потребитель не копил результаты в памяти
+    queue = asyncio.Queue(maxsize=concurrency)
+    done = object()
+
+    async def call(username, ruobr, limit, name, args, kwargs):
+        async with limit, requests:
+            try:
+                item = FleetResult(
+                    username, name, await getattr(ruobr, name)(*args, **kwargs), None
+                )
+            except Exception as e:
+                item = FleetResult(username, name, None, e)
+        await queue.put(item)
+
+    async def worker():
+        # Один аккаунт на воркер, поэтому одновременно в работе
+        # не больше concurrency аккаунтов, сколько бы их ни было
+        for username, password in accounts:
+            ruobr = AsyncRuobr(username, password, client=client, **options)
+            try:
+                async with requests:
+                    user = await ruobr.get_user()
+            except Exception as e:
+                await queue.put(FleetResult(username, "get_user", None, e))
+                continue
+            await queue.put(FleetResult(username, "get_user", user, None))
+
+            limit = asyncio.Semaphore(per_account)
+            await asyncio.gather(
+                *[call(username, ruobr, limit, *c) for c in calls if c[0] != "get_user"]
+            )
+
+    async def supervisor():
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            await queue.put(done)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    watcher = asyncio.ensure_future(supervisor())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            yield item
+        await watcher  # пробрасывает ошибку, если она возникла вне вызовов
+    finally:
+        for task in workers + [watcher]:
+            task.cancel()
+        await asyncio.gather(*workers, watcher, return_exceptions=True)
+        if own_client:
+            await client.aclose()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.cache import endpoint
+from bisect import bisect_left
+from threading import Lock
+from typing import Callable, Dict, List
+import re
+
+# Границы корзин гистограммы задержек, секунды
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+def endpoint_name(target: str) -> str:
+    """Убирает из пути идентификаторы: 'all_marks/1/2/?child=3' -> 'all_marks/{id}/{id}/'"""
+
+    return re.sub(r"/\d+(?=/)", "/{id}", "/" + endpoint(target))[1:]
+
+
+class _Endpoint(object):
+    __slots__ = (
+        "requests",
+        "errors",
+        "retries",
+        "cache_hits",
+        "cache_misses",
+        "revalidations",
+        "bytes",
+        "latency_sum",
+        "decode_sum",
+        "buckets",
+        "statuses",
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = {}  # тип исключения -> количество
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.revalidations = 0  # промахи, обошедшиеся ответом 304
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.decode_sum = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.statuses = {}  # код ответа -> количество
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Metrics(object):
+    """Сборщик метрик запросов по методам API
+    Пример:
+    >>> metrics = Metrics()
+    >>> r = Ruobr('username', 'password', hooks=metrics.hooks)
+    >>> print(metrics.prometheus())"""
+
+    def __init__(self):
+        self._endpoints = {}  # type: Dict[str, _Endpoint]
+        self._lock = Lock()
+
+    @property
+    def hooks(self) -> Dict[str, List[Callable]]:
+        return {
+            "response": [self.on_response],
+            "error": [self.on_error],
+            "retry": [self.on_retry],
+            "cache": [self.on_cache],
+            "revalidated": [self.on_revalidated],
+            "decode": [self.on_decode],
+        }
+
+    def _endpoint(self, target: str) -> _Endpoint:
+        name = endpoint_name(target)
+        if name not in self._endpoints:
+            self._endpoints[name] = _Endpoint()
+        return self._endpoints[name]
+
+    def on_response(
+        self, target: str, response, elapsed: float, size: int = None, **info
+    ):
+        if size is None:
+            size = len(response.content)
+        with self._lock:
+            e = self._endpoint(target)
+            e.requests += 1
+            e.bytes += size
+            e.latency_sum += elapsed
+            e.buckets[bisect_left(BUCKETS, elapsed)] += 1
+            e.statuses[response.status_code] = (
+                e.statuses.get(response.status_code, 0) + 1
+            )
+
+    def on_error(self, target: str, error: Exception, **info):
+        with self._lock:
+            e = self._endpoint(target)
+            name = type(error).__name__
+            e.errors[name] = e.errors.get(name, 0) + 1
+
+    def on_retry(self, target: str, **info):
+        with self._lock:
+            self._endpoint(target).retries += 1
+
+    def on_cache(self, target: str, hit: bool, **info):
+        with self._lock:
+            e = self._endpoint(target)
+            if hit:
+                e.cache_hits += 1
+            else:
+                e.cache_misses += 1
+
+    def on_revalidated(self, target: str, **info):
+        with self._lock:
+            self._endpoint(target).revalidations += 1
+
+    def on_decode(self, target: str, elapsed: float, **info):
+        with self._lock:
+            self._endpoint(target).decode_sum += elapsed
+
+    def as_dict(self) -> Dict[str, dict]:
+        with self._lock:
+            return {name: e.as_dict() for name, e in self._endpoints.items()}
+
+    def prometheus(self, prefix: str = "ruobr") -> str:
+        """Возвращает метрики в текстовом формате Prometheus"""
+
+        data = sorted(self.as_dict().items())
+        families = {
+            "request_duration_seconds": ("histogram", []),
+            "response_bytes_total": ("counter", []),
+            "decode_seconds_total": ("counter", []),
+            "retries_total": ("counter", []),
+            "cache_hits_total": ("counter", []),
+            "cache_misses_total": ("counter", []),
+            "cache_revalidations_total": ("counter", []),
+            "errors_total": ("counter", []),
+            "responses_total": ("counter", []),
+        }
+
+        def add(family, value, suffix="", **labels):
+            labels = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            families[family][1].append(
+                f"{prefix}_{family}{suffix}{{{labels}}} {value!r}"
+            )
+
+        for name, e in data:
+            total = 0
+            for bound, count in zip(BUCKETS, e["buckets"]):
+                total += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                add("request_duration_seconds", total, "_bucket", endpoint=name, le=le)
+            add("request_duration_seconds", e["latency_sum"], "_sum", endpoint=name)
+            add("request_duration_seconds", e["requests"], "_count", endpoint=name)
+            add("response_bytes_total", e["bytes"], endpoint=name)
+            add("decode_seconds_total", e["decode_sum"], endpoint=name)
+            add("retries_total", e["retries"], endpoint=name)
+            add("cache_hits_total", e["cache_hits"], endpoint=name)
+            add("cache_misses_total", e["cache_misses"], endpoint=name)
+            add("cache_revalidations_total", e["revalidations"], endpoint=name)
+            for error, count in sorted(e["errors"].items()):
+                add("errors_total", count, endpoint=name, type=error)
+            for status, count in sorted(e["statuses"].items()):
+                add("responses_total", count, endpoint=name, status=status)
+
+        lines = []
+        for family, (kind, samples) in families.items():
+            lines.append(f"# TYPE {prefix}_{family} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from typing import Any, Dict, Iterator, List, Union
+import json
+
+
+class Model(object):
+    """Компактная запись ответа сервера
+    Частые поля хранятся в слотах и доступны как атрибуты, остальные
+    сжимаются в JSON и разбираются только при первом обращении к ним.
+    Запись поддерживает обращение как к словарю (item['id'], item.get),
+    поэтому подходит для функций, ожидающих dict, а to_dict() возвращает
+    исходный словарь"""
+
+    __slots__ = ("_present", "_extra")
+    _fields = ()
+    _nested = {}  # поле -> модель элементов вложенного списка
+
+    def __init__(self, data: Dict[str, Any]):
+        present = 0
+        for i, name in enumerate(self._fields):
+            value = data.get(name)
+            if name in data:
+                present |= 1 << i
+                model = self._nested.get(name)
+                if model is not None and isinstance(value, list):
+                    value = [model(item) for item in value]
+            setattr(self, name, value)
+        self._present = present
+
+        if len(data) > bin(present).count("1"):
+            extra = {k: v for k, v in data.items() if k not in self._fields}
+            self._extra = json.dumps(
+                extra, ensure_ascii=False, separators=(",", ":")
+            ).encode("UTF-8")
+        else:
+            self._extra = None
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        """Редкие поля записи"""
+
+        if self._extra is None:
+            return {}
+        if isinstance(self._extra, bytes):
+            self._extra = json.loads(self._extra)
+        return self._extra
+
+    def __getattr__(self, name: str) -> Any:
+        # Вызывается только для полей, которых нет в слотах
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.extra[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def keys(self) -> List[str]:
+        fields = [name for i, name in enumerate(self._fields) if self._present >> i & 1]
+        return fields + list(self.extra)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._fields:
+            return bool(self._present >> self._fields.index(key) & 1)
+        return key in self.extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._fields:
+            if self._present >> self._fields.index(key) & 1:
+                return getattr(self, key)
+            raise KeyError(key)
+        return self.extra[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Возвращает запись в виде словаря, как без typed"""
+
+        result = {}
+        for i, name in enumerate(self._fields):
+            if self._present >> i & 1:
+                value = getattr(self, name)
+                if name in self._nested and isinstance(value, list):
+                    value = [item.to_dict() for item in value]
+                result[name] = value
+        result.update(self.extra)
+        return result
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Model):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for i, name in enumerate(self._fields)
+            if self._present >> i & 1
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self.to_dict()
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(state)
+
+
+class Child(Model):
+    """Ребёнок аккаунта (get_children)"""
+
+    __slots__ = _fields = (
+        "id",
+        "first_name",
+        "last_name",
+        "middle_name",
+        "school",
+        "group",
+        "school_is_food",
+    )
+
+
+class Message(Model):
+    """Сообщение почты (get_mail, get_message)"""
+
+    __slots__ = _fields = ("id", "type_id", "subject", "author", "post_date", "read")
+
+
+class Lesson(Model):
+    """Урок дневника (get_timetable)"""
+
+    __slots__ = _fields = (
+        "id",
+        "date",
+        "time_start",
+        "time_end",
+        "subject",
+        "staff",
+        "topic",
+    )
+
+
+class Mark(Model):
+    """Итоговая оценка по предмету"""
+
+    __slots__ = _fields = ("subject_id", "subject", "mark")
+
+
+class ControlMarks(Model):
+    """Итоговые оценки за период (get_control_marks)"""
+
+    __slots__ = _fields = ("period", "title", "marks")
+    _nested = {"marks": Mark}
+
+
+class Classmate(Model):
+    """Одноклассник (get_classmates)"""
+
+    __slots__ = _fields = ("id", "first_name", "last_name", "middle_name")
+
+
+def typed(model: type, data: Union[dict, List[dict]]) -> Union[Model, List[Model]]:
+    """Превращает запись или список записей в модели"""
+
+    if isinstance(data, list):
+        return [model(item) for item in data]
+    return model(data)
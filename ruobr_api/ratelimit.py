@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from threading import Lock
+import os
+import time
+
+
+class TokenBucket(object):
+    """Ограничитель частоты запросов: rate запросов в секунду, всплески до capacity
+    Один экземпляр можно передать любому числу Ruobr и AsyncRuobr в одном процессе"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.total_wait = 0.0  # Суммарное время ожидания, секунды
+        self.requests = 0
+        self._tokens = self.capacity
+        self._updated = self._now()
+        self._lock = Lock()
+
+    @staticmethod
+    def _now() -> float:
+        return time.monotonic()
+
+    def _take(self, tokens: float, updated: float, now: float):
+        """Пополняет корзину и забирает один токен
+        Возвращает новое состояние и время, которое нужно подождать"""
+
+        tokens = min(self.capacity, tokens + (now - updated) * self.rate) - 1
+        return tokens, max(0.0, -tokens / self.rate)
+
+    def reserve(self) -> float:
+        """Занимает место для запроса и возвращает, сколько секунд нужно подождать
+        Сам метод не блокирует, поэтому подходит и для синхронного, и для async кода"""
+
+        with self._lock:
+            now = self._now()
+            self._tokens, wait = self._take(self._tokens, self._updated, now)
+            self._updated = now
+            self.total_wait += wait
+            self.requests += 1
+            return wait
+
+    @property
+    def wait_time(self) -> float:
+        """Сколько секунд ждал бы запрос, отправленный сейчас"""
+
+        with self._lock:
+            tokens = min(
+                self.capacity, self._tokens + (self._now() - self._updated) * self.rate
+            )
+            return max(0.0, (1 - tokens) / self.rate)
+
+
+class FileTokenBucket(TokenBucket):
+    """TokenBucket, состояние которого хранится в файле path
+    Позволяет нескольким процессам на одной машине делить один лимит.
+    Использует fcntl, поэтому работает только на Unix"""
+
+    def __init__(self, path: str, rate: float, capacity: float = None):
+        import fcntl  # noqa: F401 - проверяем наличие сразу
+
+        self.path = path
+        super().__init__(rate, capacity)
+
+    @staticmethod
+    def _now() -> float:
+        return time.time()  # Монотонные часы у разных процессов не совпадают
+
+    def _locked(self, update: bool):
+        import fcntl
+
+        with self._lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                data = os.read(fd, 64).split()
+                now = self._now()
+                if len(data) == 2:
+                    tokens, updated = float(data[0]), float(data[1])
+                else:
+                    tokens, updated = self.capacity, now
+                new_tokens, wait = self._take(tokens, updated, now)
+                if update:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.ftruncate(fd, 0)
+                    os.write(fd, f"{new_tokens!r} {now!r}".encode())
+                    self.total_wait += wait
+                    self.requests += 1
+                return wait
+            finally:
+                os.close(fd)  # Закрытие снимает блокировку
+
+    def reserve(self) -> float:
+        return self._locked(update=True)
+
+    @property
+    def wait_time(self) -> float:
+        return self._locked(update=False)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.exceptions import CircuitOpenException
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import random
+import time
+
+
+class RetryPolicy(object):
+    """Повтор GET-запросов при сетевых ошибках и ответах 429/5xx
+    Задержка растёт экспоненциально: backoff * 2 ** (попытка - 1), но не больше
+    max_backoff, и уменьшается на случайную долю до jitter. Заголовок Retry-After
+    имеет приоритет над расчётной задержкой"""
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        jitter: float = 0.5,
+        statuses: Tuple[int, ...] = (429, 500, 502, 503, 504),
+    ):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses
+
+    def retry_after(self, response: "httpx.Response") -> Optional[float]:
+        value = response.headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        from email.utils import parsedate_to_datetime
+
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+    def delay(
+        self, attempt: int, response: "httpx.Response" = None, error: Exception = None
+    ) -> Optional[float]:
+        """Возвращает задержку перед следующей попыткой или None, если повторять не нужно"""
+
+        if attempt >= self.attempts:
+            return None
+        if error is None and response.status_code not in self.statuses:
+            return None
+
+        if response is not None:
+            delay = self.retry_after(response)
+            if delay is not None:
+                return min(delay, self.max_backoff)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker(object):
+    """Размыкается после failures сетевых ошибок или ответов 5xx подряд
+    Пока цепь разомкнута, запросы сразу падают с CircuitOpenException.
+    Через reset_timeout секунд пропускается одна пробная попытка"""
+
+    _hosts = {}  # type: Dict[str, CircuitBreaker]
+    _hosts_lock = Lock()
+
+    def __init__(self, failures: int = 5, reset_timeout: float = 30.0):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.state = "closed"  # closed, open или half-open
+        self._count = 0
+        self._opened_at = 0.0
+        self._lock = Lock()
+
+    @classmethod
+    def for_host(cls, host: str, **kwargs) -> "CircuitBreaker":
+        """Возвращает общий для всех клиентов автомат для хоста"""
+
+        with cls._hosts_lock:
+            if host not in cls._hosts:
+                cls._hosts[host] = cls(**kwargs)
+            return cls._hosts[host]
+
+    def before(self):
+        """Вызывается перед запросом, падает, если цепь разомкнута"""
+
+        with self._lock:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                # Если результат пробы так и не записан (задачу отменили или
+                # запрос упал с другой ошибкой), через reset_timeout
+                # пропускается следующая
+                self.state = "half-open"
+                self._opened_at = now
+                return
+            raise CircuitOpenException("Сервер недоступен, повторите позже")
+
+    def record(self, success: bool):
+        with self._lock:
+            if success:
+                self.state = "closed"
+                self._count = 0
+                return
+            self._count += 1
+            if self.state == "half-open" or self._count >= self.failures:
+                self.state = "open"
+                self._opened_at = time.monotonic()
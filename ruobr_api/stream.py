@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from typing import Any, List
+import codecs
+import json
+import re
+
+# Внутри строки важны только кавычка и экранирование, вне строки - скобки и запятые
+_STRING = re.compile(rb'["\\]')
+_TOKENS = re.compile(rb'[\[\]{},"]')
+_SEPARATORS = re.compile(r"[\s,]*")
+_decoder = json.JSONDecoder()
+
+
+class ArrayStream(object):
+    """Достаёт элементы массива key верхнего объекта из JSON, приходящего частями
+    feed() принимает очередной кусок ответа и возвращает элементы, которые
+    уже пришли целиком. Элементами должны быть объекты или массивы.
+    Пока массив не найден, ответ накапливается в buffer, чтобы ошибку
+    сервера ({"success": false, ...}) можно было разобрать целиком
+
+    Пример:
+    >>> stream = ArrayStream('lessons')
+    >>> stream.feed(b'{"lessons": [{"id": 1}, {"i') + stream.feed(b'd": 2}]}')
+    [{'id': 1}, {'id': 2}]"""
+
+    def __init__(self, key: str):
+        self.key = key.encode("UTF-8")
+        self.found = False  # Начало массива найдено
+        self.done = False  # Массив закончился, остаток ответа не нужен
+        self.buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._string = None  # Начало текущей строки
+        self._expect_key = False  # Следующая строка в верхнем объекте - ключ
+        self._last_key = None
+        # Внутри массива ответ хранится текстом и разбирается json.raw_decode:
+        # это быстрее, чем искать границы элементов вручную
+        self._text = ""
+        self._utf8 = codecs.getincrementaldecoder("UTF-8")()
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        if self.done:
+            return []
+        if not self.found:
+            self.buffer += chunk
+            if not self._find():
+                return []
+            chunk = bytes(self.buffer[self._pos :])
+            self.buffer = bytearray()
+        return self._items(chunk)
+
+    def _find(self) -> bool:
+        """Ищет начало массива key, разбирая ответ до него по скобкам и строкам"""
+
+        buffer, pos = self.buffer, self._pos
+        while pos < len(buffer):
+            if self._string is not None:
+                match = _STRING.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if match.group() == b"\\":
+                    pos = match.end() + 1  # Пропускаем экранированный символ
+                    continue
+                pos = match.end()
+                if self._depth == 1 and self._expect_key:
+                    self._last_key = bytes(buffer[self._string + 1 : pos - 1])
+                    self._expect_key = False
+                self._string = None
+                continue
+
+            match = _TOKENS.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            token, pos = match.group(), match.end()
+            if token == b'"':
+                self._string = match.start()
+            elif token in b"[{":
+                if self._depth == 0 and token == b"{":
+                    self._expect_key = True
+                elif self._depth == 1 and token == b"[":
+                    if self._last_key == self.key:
+                        self._pos = pos
+                        self.found = True
+                        return True
+                self._depth += 1
+            elif token in b"]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._last_key = None
+            elif token == b"," and self._depth == 1:
+                self._expect_key = True
+        self._pos = pos
+        return False
+
+    def _items(self, chunk: bytes) -> List[Any]:
+        text = self._text + self._utf8.decode(chunk)
+        items, index = [], 0
+        while True:
+            index = _SEPARATORS.match(text, index).end()
+            if index == len(text):
+                break
+            if text[index] == "]":
+                self.done = True
+                break
+            try:
+                item, index = _decoder.raw_decode(text, index)
+            except ValueError:
+                break  # Элемент пришёл не целиком, ждём следующий кусок
+            items.append(item)
+        self._text = text[index:]
+        return items
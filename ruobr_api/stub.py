@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api.testing import Cassette
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Condition, Thread
+from typing import Any, Tuple
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import base64
+import json
+import random
+import socket
+import time
+
+# Так начинается соединение HTTP/2 без TLS (h2c)
+H2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+SUBJECTS = ["Алгебра", "Геометрия", "Физика", "Литература", "История", "Химия"]
+TEACHERS = ["Иванова М. П.", "Петров А. С.", "Сидорова Е. В.", "Кузнецов И. И."]
+
+
+class Payloads(object):
+    """Синтетические ответы на все запросы API
+    Ответы детерминированы: одинаковый запрос возвращает одни и те же данные,
+    размер задаётся числом детей, уроков в день, сообщений и т. п."""
+
+    def __init__(
+        self,
+        children: int = 2,
+        lessons_per_day: int = 6,
+        messages: int = 30,
+        periods: int = 4,
+    ):
+        self.children = children
+        self.lessons_per_day = lessons_per_day
+        self.messages = messages
+        self.periods = periods
+
+    def __call__(self, target: str, username: str = "") -> Tuple[int, Any]:
+        """Возвращает статус и тело ответа на запрос"""
+
+        url = urlsplit("/" + target)
+        parts = [p for p in url.path.split("/") if p]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        child = int(query.get("child", 1))
+        name = parts[0] if parts else ""
+
+        if name == "user":
+            return 200, self.user(username)
+        if name == "mail" and len(parts) == 1:
+            return 200, {"messages": self.mail()}
+        if name == "mail" and parts[1] == "new":
+            return 200, {"data": [{"id": 1, "name": "Классный руководитель"}]}
+        if name == "mail":
+            if int(parts[1]) % 7 == 0:  # как type_id == 2 на настоящем сервере
+                return 502, "Bad Gateway"
+            return 200, {"data": self.message(int(parts[1]))}
+        if name == "timetable2":
+            return 200, {"lessons": self.timetable(query["start"], query["end"])}
+        if name == "controlmark":
+            return 200, self.control_marks()
+        if name == "all_marks":
+            return 200, {"data": self.all_marks(int(parts[1]), int(parts[2]))}
+        if name == "food":
+            return 200, {"data": {"date": query.get("selected_date"), "menu": []}}
+        if name == "btm":
+            return 200, {"events": [], "success": True}
+        if name in ("achievements", "do", "ios", "guide"):
+            return 200, {"data": {"child": child, "name": name}}
+        if name in ("birthday", "odnoklassniki", "book"):
+            return 200, {"data": self.classmates(child)}
+        return 404, {"success": False, "error": f"Неизвестный запрос {target}"}
+
+    def user(self, username: str) -> dict:
+        seed = sum(username.encode("UTF-8")) * 100
+        childs = [
+            {
+                "id": seed + i + 1,
+                "first_name": f"Ученик {i + 1}",
+                "last_name": "Тестовый",
+                "middle_name": "",
+                "school": "Школа № 1",
+                "group": f"{5 + i}А",
+                "school_is_food": 1,
+            }
+            for i in range(self.children)
+        ]
+        return {"status": "applicant", "success": True, "childs": childs}
+
+    def mail(self) -> list:
+        return [
+            {
+                "id": i,
+                "type_id": 2 if i % 7 == 0 else 1,
+                "subject": f"Сообщение {i}",
+                "author": TEACHERS[i % len(TEACHERS)],
+                "post_date": "2020-04-27 12:00:00",
+                "read": i % 3 == 0,
+                "last_msg_text": "Текст сообщения " * 5,
+            }
+            for i in range(1, self.messages + 1)
+        ]
+
+    def message(self, message_id: int) -> dict:
+        return {
+            "id": message_id,
+            "subject": f"Сообщение {message_id}",
+            "messages": [{"author": TEACHERS[0], "text": "Текст сообщения " * 20}],
+        }
+
+    def timetable(self, start: str, end: str) -> list:
+        day, end = date.fromisoformat(start), date.fromisoformat(end)
+        lessons = []
+        while day <= end:
+            if day.weekday() < 6:
+                for number in range(self.lessons_per_day):
+                    key = day.toordinal() * 10 + number
+                    lessons.append(
+                        {
+                            "id": key,
+                            "date": day.isoformat(),
+                            "time_start": f"{8 + number:02d}:30:00",
+                            "time_end": f"{9 + number:02d}:10:00",
+                            "subject": SUBJECTS[key % len(SUBJECTS)],
+                            "staff": TEACHERS[key % len(TEACHERS)],
+                            "topic": f"Тема урока {number + 1}",
+                            "task": {"id": key, "title": "§ 12, № 3-5", "doc": False},
+                            "marks": [],
+                        }
+                    )
+            day += timedelta(days=1)
+        return lessons
+
+    def control_marks(self) -> list:
+        return [
+            {
+                "period": period,
+                "title": f"{period} четверть",
+                "marks": [
+                    {"subject_id": i + 1, "subject": subject, "mark": str(3 + i % 3)}
+                    for i, subject in enumerate(SUBJECTS)
+                ],
+            }
+            for period in range(1, self.periods + 1)
+        ]
+
+    def all_marks(self, period: int, subject_id: int) -> dict:
+        return {
+            "marks": [
+                {
+                    "mark": str(2 + (period + subject_id + i) % 4),
+                    "date": "2020-04-27",
+                    "weight": 1 + i % 2,
+                }
+                for i in range(8)
+            ]
+        }
+
+    def classmates(self, child: int) -> list:
+        return [
+            {"id": child * 100 + i, "first_name": f"Ученик {i}", "last_name": "Тестов"}
+            for i in range(25)
+        ]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Нагрузочные тесты открывают сотни соединений
+
+
+class StubServer(object):
+    """Локальный HTTP-сервер, изображающий API дневника
+    Отвечает из кассеты, а на запросы, которых в ней нет, - синтетическими
+    данными. latency и jitter задают задержку ответа в секундах, error_rate -
+    долю ответов с кодом error_status для проверки повторов и защиты.
+    Кроме HTTP/1.1 сервер понимает HTTP/2 без TLS (Ruobr(..., http2='h2c')),
+    для этого нужен пакет h2
+
+    Пример:
+    >>> with StubServer(latency=0.02, error_rate=0.01) as server:
+    ...     r = Ruobr('username', 'password', base_url=server.base_url)"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        cassette: Cassette = None,
+        payloads: Payloads = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 502,
+        seed: int = None,
+    ):
+        self.cassette = cassette
+        self.payloads = payloads or Payloads()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._server = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def respond(self, target: str, username: str) -> Tuple[int, dict, bytes]:
+        """Возвращает статус, заголовки и тело ответа"""
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status, {}, b"Bad Gateway"
+        if self.cassette is not None and target in self.cassette:
+            item = self.cassette.play(target)
+            return item["status"], item["headers"], item["body"].encode("UTF-8")
+        status, body = self.payloads(target, username)
+        if not isinstance(body, str):
+            body = json.dumps(body, ensure_ascii=False)
+        return status, {"Content-Type": "application/json"}, body.encode("UTF-8")
+
+    def _serve_h2(self, sock: socket.socket):
+        """Обслуживает соединение HTTP/2, каждый поток запроса - в своей нити,
+        чтобы задержка одного ответа не задерживала остальные"""
+
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import ConnectionTerminated, RequestReceived, WindowUpdated
+        from h2.exceptions import StreamClosedError
+
+        conn = H2Connection(H2Configuration(client_side=False, header_encoding="UTF-8"))
+        window = Condition()  # Защищает conn и ждёт освобождения окна
+
+        def flush():
+            data = conn.data_to_send()
+            if data:
+                sock.sendall(data)
+
+        def respond(stream_id: int, headers: dict):
+            try:
+                username = base64.b64decode(headers.get("username", ""))
+                username = username.decode("UTF-8", "replace")
+            except ValueError:
+                username = ""
+            status, extra, body = self.respond(headers[":path"].lstrip("/"), username)
+            response = [(":status", str(status)), ("content-length", str(len(body)))]
+            response += [(name.lower(), value) for name, value in extra.items()]
+            try:
+                with window:
+                    conn.send_headers(stream_id, response, end_stream=not body)
+                    flush()
+                    while body:
+                        size = min(
+                            conn.local_flow_control_window(stream_id),
+                            conn.max_outbound_frame_size,
+                            len(body),
+                        )
+                        if size <= 0:
+                            window.wait()
+                            continue
+                        conn.send_data(
+                            stream_id, body[:size], end_stream=size == len(body)
+                        )
+                        body = body[size:]
+                        flush()
+            except (StreamClosedError, OSError):
+                pass  # Клиент закрыл поток или соединение
+
+        with window:
+            conn.initiate_connection()
+            flush()
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return
+            with window:
+                events = conn.receive_data(data)
+                flush()
+                window.notify_all()
+            for event in events:
+                if isinstance(event, RequestReceived):
+                    Thread(
+                        target=respond,
+                        args=(event.stream_id, dict(event.headers)),
+                        daemon=True,
+                    ).start()
+                elif isinstance(event, ConnectionTerminated):
+                    return
+
+    def _handler(self) -> type:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, как у настоящего сервера
+            # Заголовки и тело уходят двумя записями в сокет: с алгоритмом
+            # Нейгла и отложенным ACK каждый ответ задерживался бы на ~40 мс
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                # Клиент h2c начинает соединение сразу с преамбулы HTTP/2
+                preface = self.request.recv(
+                    len(H2_PREFACE), socket.MSG_PEEK | socket.MSG_WAITALL
+                )
+                if preface == H2_PREFACE:
+                    stub._serve_h2(self.request)
+                else:
+                    super().handle()
+
+            def do_GET(self):
+                try:
+                    username = base64.b64decode(self.headers.get("username", ""))
+                    username = username.decode("UTF-8", "replace")
+                except ValueError:
+                    username = ""
+                status, headers, body = stub.respond(self.path.lstrip("/"), username)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Локальный сервер, изображающий API дневника"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cassette", help="JSON-файл с записанными ответами")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=502)
+    parser.add_argument("--children", type=int, default=2)
+    parser.add_argument("--lessons-per-day", type=int, default=6)
+    parser.add_argument("--messages", type=int, default=30)
+    args = parser.parse_args()
+
+    server = StubServer(
+        args.host,
+        args.port,
+        Cassette(args.cassette) if args.cassette else None,
+        Payloads(args.children, args.lessons_per_day, args.messages),
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.error_status,
+    )
+    print(f"Сервер запущен: {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from collections import defaultdict
+from threading import Lock
+from typing import Dict, List
+import httpx
+import json
+import os
+
+# Заголовки ответа, которые сохраняются в кассету
+HEADERS = ("content-type", "etag", "last-modified", "retry-after")
+
+
+def request_target(request: httpx.Request) -> str:
+    """Запрос без адреса сервера: 'timetable2/?start=...&child=1'"""
+
+    return request.url.raw_path.decode("ascii").lstrip("/")
+
+
+class Cassette(object):
+    """Записанные ответы сервера, сохраняемые в JSON-файл
+    Логин и пароль передаются в заголовках запроса, а сохраняются только
+    ответы, поэтому в файл они не попадают. Если на один запрос записано
+    несколько ответов, при воспроизведении они отдаются по кругу"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self._responses = defaultdict(list)  # запрос -> [ответ]
+        self._played = defaultdict(int)
+        self._lock = Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return sum(len(r) for r in self._responses.values())
+
+    def __contains__(self, target: str) -> bool:
+        return target in self._responses
+
+    @property
+    def targets(self) -> List[str]:
+        return list(self._responses)
+
+    def load(self, path: str = None):
+        with open(path or self.path, encoding="UTF-8") as f:
+            for item in json.load(f):
+                self._responses[item["target"]].append(item)
+
+    def save(self, path: str = None):
+        items = [item for items in self._responses.values() for item in items]
+        with open(path or self.path, "w", encoding="UTF-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=1)
+
+    def add(self, target: str, status: int, headers: Dict[str, str], body: bytes):
+        item = {
+            "target": target,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() in HEADERS},
+            "body": body.decode("UTF-8", "replace"),
+        }
+        with self._lock:
+            self._responses[target].append(item)
+
+    def play(self, target: str) -> dict:
+        """Возвращает следующий записанный ответ на запрос, KeyError - если его нет"""
+
+        with self._lock:
+            items = self._responses.get(target)
+            if not items:
+                raise KeyError(f"Ответа на {target} нет в кассете")
+            item = items[self._played[target] % len(items)]
+            self._played[target] += 1
+        return item
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Транспорт httpx, отвечающий из кассеты без обращения к сети
+    Подходит и для Client, и для AsyncClient
+
+    Пример:
+    >>> transport = ReplayTransport(Cassette('ruobr.json'))
+    >>> r = Ruobr('username', 'password', client=httpx.Client(transport=transport))"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        item = self.cassette.play(request_target(request))
+        return httpx.Response(
+            item["status"],
+            headers=item["headers"],
+            content=item["body"].encode("UTF-8"),
+            request=request,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return self.handle_request(request)
+
+
+class RecordTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Транспорт httpx, отправляющий запросы на сервер и записывающий ответы
+    Кассету нужно сохранить вызовом save() после работы
+
+    Пример:
+    >>> cassette = Cassette('ruobr.json')
+    >>> with httpx.Client(transport=RecordTransport(cassette)) as client:
+    ...     Ruobr('username', 'password', client=client).get_mail()
+    >>> cassette.save()"""
+
+    def __init__(self, cassette: Cassette, transport=None, async_transport=None):
+        self.cassette = cassette
+        self.transport = transport
+        self.async_transport = async_transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.transport is None:
+            self.transport = httpx.HTTPTransport()
+        response = self.transport.handle_request(request)
+        response.read()
+        self._record(request, response)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.async_transport is None:
+            self.async_transport = httpx.AsyncHTTPTransport()
+        response = await self.async_transport.handle_async_request(request)
+        await response.aread()
+        self._record(request, response)
+        return response
+
+    def _record(self, request: httpx.Request, response: httpx.Response):
+        self.cassette.add(
+            request_target(request),
+            response.status_code,
+            dict(response.headers),
+            response.content,
+        )
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def aclose(self):
+        if self.async_transport is not None:
+            await self.async_transport.aclose()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+:authors: raitonoberu
+:license: Apache License, Version 2.0, see LICENSE file
+:copyright: (c) 2021 raitonoberu
+"""
+from ruobr_api._lazy import LazyModule
+from datetime import date, datetime, timedelta
+from itertools import islice
+import re
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+asyncio = LazyModule("asyncio")
+futures = LazyModule("concurrent.futures")
+
+DateLike = Union[str, date, datetime]
+T = TypeVar("T")
+# Вызов задаётся именем метода или кортежем (имя, args) / (имя, args, kwargs)
+Call = Union[str, Tuple[str, tuple], Tuple[str, tuple, dict]]
+
+
+def to_date(value: DateLike) -> date:
+    """Приводит '2020-04-27', date или datetime к date"""
+
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def split_range(
+    start: DateLike, end: DateLike, window: str = "week"
+) -> List[Tuple[date, date]]:
+    """Разбивает период [start, end] на непересекающиеся окна
+    window - 'week' (по 7 дней) или 'month' (по календарным месяцам)"""
+
+    if window not in ("week", "month"):
+        raise ValueError("window должен быть 'week' или 'month'")
+
+    start, end = to_date(start), to_date(end)
+    windows = []
+    while start <= end:
+        if window == "week":
+            stop = start + timedelta(days=6)
+        else:
+            following = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+            stop = following - timedelta(days=1)
+        stop = min(stop, end)
+        windows.append((start, stop))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+def merge_lessons(chunks: Iterable[List[dict]]) -> List[dict]:
+    """Склеивает части дневника по порядку, убирая повторяющиеся уроки"""
+
+    seen = set()
+    lessons = []
+    for chunk in chunks:
+        for lesson in chunk:
+            key = lesson.get("id")
+            if key is not None:
+                if key in seen:
+                    continue
+                seen.add(key)
+            lessons.append(lesson)
+    return lessons
+
+
+def mark_pairs(control_marks: List[dict]) -> List[Tuple[int, int]]:
+    """Возвращает пары (период, предмет) из get_control_marks для get_all_marks
+    Пропускает предметы, у которых итоговых оценок явно нет"""
+
+    pairs = []
+    for period in control_marks:
+        for subject in period.get("marks") or ():
+            fields = [subject[k] for k in ("mark", "marks") if k in subject]
+            if fields and not any(fields):
+                continue
+            pairs.append((period["period"], subject["subject_id"]))
+    return pairs
+
+
+def parse_mark(value: Any) -> float:
+    """Приводит оценку к числу: '5' -> 5.0, '4-' -> 4.0, 'н' -> nan"""
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.match(r"\s*(\d+(?:[.,]\d+)?)", str(value or ""))
+    if match is None:
+        return float("nan")
+    return float(match.group(1).replace(",", "."))
+
+
+def mark_records(data: Any) -> Iterator[dict]:
+    """Находит в ответе get_all_marks все записи с полем mark"""
+
+    if isinstance(data, dict):
+        if "mark" in data:
+            yield data
+            return
+        data = list(data.values())
+    if isinstance(data, (list, tuple)):
+        for item in data:
+            yield from mark_records(item)
+
+
+def normalize_call(call: Call) -> Tuple[str, tuple, dict]:
+    """Приводит вызов к виду (имя, args, kwargs)"""
+
+    if isinstance(call, str):
+        return call, (), {}
+    name, args, kwargs = (tuple(call) + ((), {}))[:3]
+    return name, tuple(args), dict(kwargs)
+
+
+def threaded_imap(
+    func: Callable[[T], Any], items: Iterable[T], workers: int
+) -> Iterator[Tuple[T, Any]]:
+    """Выполняет func для items в пуле потоков и отдаёт (item, результат) по готовности
+    Одновременно выполняется не больше workers задач. Если func упала,
+    вместо результата отдаётся исключение, остальные задачи продолжаются"""
+
+    items = iter(items)
+    with futures.ThreadPoolExecutor(workers) as pool:
+        pending = {pool.submit(func, item): item for item in islice(items, workers)}
+        try:
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    for following in islice(items, 1):
+                        pending[pool.submit(func, following)] = following
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = e
+                    yield item, result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+async def bounded_imap(
+    func: Callable[[T], Awaitable], items: Iterable[T], limit: int
+) -> AsyncIterator[Tuple[T, Any]]:
+    """Асинхронный вариант threaded_imap: не больше limit корутин одновременно"""
+
+    items = iter(items)
+    pending = {asyncio.ensure_future(func(item)): item for item in islice(items, limit)}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                item = pending.pop(task)
+                for following in islice(items, 1):
+                    pending[asyncio.ensure_future(func(following))] = following
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = e
+                yield item, result
+    finally:
+        for task in pending:
+            task.cancel()
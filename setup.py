@@ -34,6 +34,13 @@ setup(
     license="Apache License, Version 2.0, see LICENSE file",
     packages=["ruobr_api"],
     install_requires=["httpx"],
+    entry_points={"console_scripts": ["ruobr=ruobr_api.cli:main"]},
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "analytics": ["numpy"],
+        "export": ["pyarrow"],
+        "speedups": ["orjson"],
+    },
     classifiers=[
         "Intended Audience :: Developers",
         "License :: OSI Approved :: Apache Software License",
@@ -2,13 +2,29 @@ import ruobr_api
 from datetime import datetime, timedelta
 import unittest
 import asyncio
+import httpx
+import json
 import os
+import subprocess
+import sys
+import tempfile
+import time
 
 username = os.getenv("USERNAME")
 password = os.getenv("PASSWORD")
+options = {}
 
-ruobr = ruobr_api.Ruobr(username, password)
-aruobr = ruobr_api.AsyncRuobr(username, password)
+if username is None:
+    # Без учётных данных тесты идут против локального сервера с синтетическими данными
+    from ruobr_api.stub import StubServer
+
+    server = StubServer()
+    server.start()
+    username, password = "username", "password"
+    options["base_url"] = server.base_url
+
+ruobr = ruobr_api.Ruobr(username, password, **options)
+aruobr = ruobr_api.AsyncRuobr(username, password, **options)
 
 loop = asyncio.get_event_loop()
 
@@ -20,11 +36,41 @@ class RuobrTests(unittest.TestCase):
     def test_getChildren(self):
         self.assertGreater(len(ruobr.get_children()), 0)
 
+    def test_session(self):
+        restored = ruobr_api.Ruobr(username, password, **options)
+        restored.load_session(ruobr.dump_session())
+        self.assertTrue(restored.is_authorized)
+        self.assertEqual(restored.user, ruobr.get_user())
+        self.assertIsNotNone(restored.get_guide())
+
+    def test_sessionRelogin(self):
+        restored = ruobr_api.Ruobr(username, password, **options)
+        restored.load_session(ruobr.dump_session())
+        self.assertTrue(restored._relogin(ruobr_api.NoSuccessException("expired")))
+        # Потоки, уже прошедшие _check_authorized, должны видеть детей
+        self.assertEqual(restored._get_child(), ruobr.get_user())
+        self.assertIsNotNone(restored.get_guide())
+        self.assertTrue(restored.is_authorized)
+
+    def test_batch(self):
+        results = ruobr.batch(["get_mail", "get_guide", ("get_message", (0,))])
+        self.assertEqual(len(results), 3)
+        self.assertIsInstance(results[1], dict)
+        self.assertIsInstance(results[2], Exception)
+
+    def test_forEachChild(self):
+        guides = ruobr.for_each_child("get_guide")
+        self.assertEqual(list(guides), [c["id"] for c in ruobr.get_children()])
+
     def test_getMessage(self):
         mail = ruobr.get_mail()
         self.assertIsNotNone(mail)
         self.assertIsNotNone(ruobr.get_message(mail[0]["id"]))
 
+    def test_getMessages(self):
+        for message_id, message in ruobr.get_messages(workers=4):
+            self.assertIsNotNone(message)
+
     def test_getRecipients(self):
         self.assertIsNotNone(ruobr.get_recipients())
 
@@ -41,6 +87,9 @@ class RuobrTests(unittest.TestCase):
                 ruobr.get_all_marks(period["period"], subject["subject_id"])
             )
 
+    def test_getAllMarksBulk(self):
+        self.assertIsInstance(ruobr.get_all_marks_bulk(), dict)
+
     def test_getEvents(self):
         self.assertIsNotNone(ruobr.get_events())
 
@@ -67,6 +116,18 @@ class RuobrTests(unittest.TestCase):
             ruobr.get_timetable(datetime.now() - timedelta(weeks=2), datetime.now())
         )
 
+    def test_getTimetableRange(self):
+        start, end = datetime.now() - timedelta(weeks=6), datetime.now()
+        self.assertEqual(
+            ruobr.get_timetable_range(start, end), ruobr.get_timetable(start, end)
+        )
+
+    def test_iterTimetable(self):
+        start, end = datetime.now() - timedelta(weeks=2), datetime.now()
+        self.assertEqual(
+            list(ruobr.iter_timetable(start, end)), ruobr.get_timetable(start, end)
+        )
+
 
 class NewAsyncRuobrTests(unittest.TestCase):
     def test_getUser(self):
@@ -75,11 +136,38 @@ class NewAsyncRuobrTests(unittest.TestCase):
     def test_getChildren(self):
         self.assertGreater(len(loop.run_until_complete(aruobr.get_children())), 0)
 
+    def test_session(self):
+        fresh = ruobr_api.AsyncRuobr(username, password, **options)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "session")
+            loop.run_until_complete(fresh.save_session(path))
+            restored = ruobr_api.AsyncRuobr(username, password, **options)
+            restored.restore_session(path)
+        self.assertTrue(restored.is_authorized)
+        self.assertEqual(restored.user, loop.run_until_complete(fresh.get_user()))
+        self.assertIsNotNone(loop.run_until_complete(restored.get_guide()))
+
+        session = json.loads(loop.run_until_complete(fresh.dump_session()))
+        session["children"] = None
+        with self.assertRaises(ValueError):
+            restored.load_session(json.dumps(session))
+
+    def test_forEachChild(self):
+        guides = loop.run_until_complete(aruobr.for_each_child("get_guide"))
+        children = loop.run_until_complete(aruobr.get_children())
+        self.assertEqual(list(guides), [c["id"] for c in children])
+
     def test_getMessage(self):
         mail = loop.run_until_complete(aruobr.get_mail())
         self.assertIsNotNone(mail)
         self.assertIsNotNone(loop.run_until_complete(aruobr.get_message(mail[0]["id"])))
 
+    def test_getMessages(self):
+        async def messages():
+            return [m async for m in aruobr.get_messages(workers=4)]
+
+        self.assertIsNotNone(loop.run_until_complete(messages()))
+
     def test_getRecipients(self):
         self.assertIsNotNone(loop.run_until_complete(aruobr.get_recipients()))
 
@@ -98,6 +186,11 @@ class NewAsyncRuobrTests(unittest.TestCase):
                 )
             )
 
+    def test_getAllMarksBulk(self):
+        self.assertIsInstance(
+            loop.run_until_complete(aruobr.get_all_marks_bulk()), dict
+        )
+
     def test_getEvents(self):
         self.assertIsNotNone(loop.run_until_complete(aruobr.get_events()))
 
@@ -128,6 +221,608 @@ class NewAsyncRuobrTests(unittest.TestCase):
             )
         )
 
+    def test_getTimetableRange(self):
+        start, end = datetime.now() - timedelta(weeks=6), datetime.now()
+        self.assertEqual(
+            loop.run_until_complete(aruobr.get_timetable_range(start, end, "month")),
+            loop.run_until_complete(aruobr.get_timetable(start, end)),
+        )
+
+    def test_iterTimetable(self):
+        start, end = datetime.now() - timedelta(weeks=2), datetime.now()
+
+        async def collect():
+            return [lesson async for lesson in aruobr.iter_timetable(start, end)]
+
+        self.assertEqual(
+            loop.run_until_complete(collect()),
+            loop.run_until_complete(aruobr.get_timetable(start, end)),
+        )
+
+
+class SingleFlightTests(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+
+    async def handler(self, request):
+        target = request.url.raw_path.decode().lstrip("/")
+        self.requests.append(target)
+        await asyncio.sleep(0.01)  # Запросы должны пересечься по времени
+        if target == "user/":
+            childs = [{"id": 1, "first_name": "Ученик"}]
+            return httpx.Response(
+                200, json={"status": "applicant", "success": True, "childs": childs}
+            )
+        if target.startswith("guide/"):
+            return httpx.Response(200, json={"data": {"name": "guide"}})
+        return httpx.Response(200, json={"success": False, "error": "Ошибка"})
+
+    async def gather(self, method, count=10):
+        transport = httpx.MockTransport(self.handler)
+        async with httpx.AsyncClient(transport=transport) as client:
+            r = ruobr_api.AsyncRuobr("username", "password", client=client)
+            return await asyncio.gather(
+                *[getattr(r, method)() for _ in range(count)], return_exceptions=True
+            )
+
+    def test_sharedResult(self):
+        results = loop.run_until_complete(self.gather("get_guide"))
+        self.assertEqual(self.requests, ["user/", "guide/?child=1"])
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(results[0], {"name": "guide"})
+
+    def test_sharedException(self):
+        results = loop.run_until_complete(self.gather("get_achievements"))
+        self.assertEqual(self.requests, ["user/", "achievements/?child=1"])
+        self.assertIsInstance(results[0], ruobr_api.NoSuccessException)
+        self.assertTrue(all(result is results[0] for result in results))
+
+
+class UtilsTests(unittest.TestCase):
+    def test_splitRange(self):
+        windows = ruobr_api.utils.split_range("2021-01-25", "2021-03-02", "month")
+        self.assertEqual(
+            [(str(a), str(b)) for a, b in windows],
+            [
+                ("2021-01-25", "2021-01-31"),
+                ("2021-02-01", "2021-02-28"),
+                ("2021-03-01", "2021-03-02"),
+            ],
+        )
+        self.assertEqual(
+            len(ruobr_api.utils.split_range("2021-01-01", "2021-01-15")), 3
+        )
+
+    def test_markPairs(self):
+        controlmarks = [
+            {"period": 1, "marks": [{"subject_id": 10, "mark": "5"}]},
+            {
+                "period": 2,
+                "marks": [{"subject_id": 10, "mark": ""}, {"subject_id": 11}],
+            },
+            {"period": 3, "marks": []},
+        ]
+        self.assertEqual(ruobr_api.utils.mark_pairs(controlmarks), [(1, 10), (2, 11)])
+
+    def test_getMessagesErrors(self):
+        from ruobr_api.stub import StubServer
+
+        # На сообщение 7 заглушка отвечает 502, остальные должны загрузиться
+        with StubServer() as server:
+            with ruobr_api.Ruobr("username", "password", base_url=server.base_url) as r:
+                results = dict(r.get_messages([1, 7, 8]))
+
+            async def collect():
+                async with ruobr_api.AsyncRuobr(
+                    "username", "password", base_url=server.base_url
+                ) as r:
+                    return dict([item async for item in r.get_messages([1, 7, 8])])
+
+            for messages in (results, loop.run_until_complete(collect())):
+                self.assertEqual(sorted(messages), [1, 7, 8])
+                self.assertIsInstance(messages[7], ruobr_api.NoSuccessException)
+                self.assertEqual(messages[8]["id"], 8)
+
+
+class CacheTests(unittest.TestCase):
+    def test_lruEviction(self):
+        cache = ruobr_api.TTLCache(maxsize=2)
+        cache.set(("u", "p", "guide/"), 1, 60)
+        cache.set(("u", "p", "ios/"), 2, 60)
+        cache.get(("u", "p", "guide/"))
+        cache.set(("u", "p", "do/cert/"), 3, 60)
+        self.assertIsNone(cache.get(("u", "p", "ios/")))
+        self.assertEqual(cache.get(("u", "p", "guide/")), 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_expiration(self):
+        cache = ruobr_api.TTLCache()
+        cache.set(("u", "p", "guide/"), 1, -1)
+        self.assertIsNone(cache.get(("u", "p", "guide/")))
+
+    def test_invalidate(self):
+        cache = ruobr_api.TTLCache()
+        cache.set(("u", "p", "guide/?child=1"), 1, 60)
+        cache.set(("v", "p", "guide/?child=2"), 2, 60)
+        cache.invalidate("u", "guide/")
+        self.assertEqual(len(cache), 1)
+
+
+class RetryTests(unittest.TestCase):
+    def test_retryDelay(self):
+        policy = ruobr_api.RetryPolicy(attempts=3, backoff=1, jitter=0)
+        response = httpx.Response(503)
+        self.assertEqual(policy.delay(1, response), 1)
+        self.assertEqual(policy.delay(2, response), 2)
+        self.assertIsNone(policy.delay(3, response))
+        self.assertIsNone(policy.delay(1, httpx.Response(404)))
+        response = httpx.Response(429, headers={"Retry-After": "5"})
+        self.assertEqual(policy.delay(1, response), 5)
+
+    def test_circuitBreaker(self):
+        breaker = ruobr_api.CircuitBreaker(failures=2, reset_timeout=60)
+        breaker.record(False)
+        breaker.before()
+        breaker.record(False)
+        self.assertRaises(ruobr_api.CircuitOpenException, breaker.before)
+
+    def test_circuitBreakerLostProbe(self):
+        breaker = ruobr_api.CircuitBreaker(failures=1, reset_timeout=0.05)
+        breaker.record(False)
+        time.sleep(0.06)
+        breaker.before()  # Проба, результат которой не записан
+        self.assertRaises(ruobr_api.CircuitOpenException, breaker.before)
+        time.sleep(0.06)
+        breaker.before()
+        breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+
+
+class RateLimitTests(unittest.TestCase):
+    def test_tokenBucket(self):
+        bucket = ruobr_api.TokenBucket(rate=10, capacity=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.wait_time, 0.2, places=2)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_endpointName(self):
+        self.assertEqual(
+            ruobr_api.metrics.endpoint_name("all_marks/1/22/?child=3"),
+            "all_marks/{id}/{id}/",
+        )
+
+    def test_collect(self):
+        metrics = ruobr_api.Metrics()
+        metrics.on_response("guide/?child=1", httpx.Response(200, content=b"{}"), 0.2)
+        metrics.on_cache("guide/?child=1", hit=True)
+        metrics.on_error("guide/?child=1", ruobr_api.NoSuccessException("error"))
+        guide = metrics.as_dict()["guide/"]
+        self.assertEqual(
+            (guide["requests"], guide["bytes"], guide["cache_hits"]), (1, 2, 1)
+        )
+        self.assertIn(
+            'ruobr_errors_total{endpoint="guide/",type="NoSuccessException"} 1',
+            metrics.prometheus(),
+        )
+
+    def test_revalidated(self):
+        def handler(request):
+            if request.url.path == "/user/":
+                return httpx.Response(
+                    200, json={"status": "child", "id": 1, "success": True}
+                )
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json={"data": {}}, headers={"etag": '"v1"'})
+
+        metrics = ruobr_api.Metrics()
+        with tempfile.TemporaryDirectory() as directory:
+            # Ответ устаревает сразу, поэтому каждый вызов - промах и запрос
+            cache = ruobr_api.SQLiteCache(
+                os.path.join(directory, "cache.db"), ttls={"guide/": 0.001}
+            )
+            client = httpx.Client(transport=httpx.MockTransport(handler))
+            r = ruobr_api.Ruobr(
+                "username", "password", client=client, cache=cache, hooks=metrics.hooks
+            )
+            for _ in range(4):
+                self.assertEqual(r.get_guide(), {})
+                time.sleep(0.002)
+        guide = metrics.as_dict()["guide/"]
+        self.assertEqual(
+            (guide["cache_hits"], guide["cache_misses"], guide["revalidations"]),
+            (0, 4, 3),
+        )
+
+
+class SQLiteCacheTests(unittest.TestCase):
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.db")
+            key = ("u", "p", "guide/?child=1")
+            cache = ruobr_api.SQLiteCache(path, maxsize=1)
+            cache.set(key, {"a": 1}, 60, etag='"v1"')
+            cache.set(("u", "p", "ios/?child=1"), 2, 60)
+            cache.set(key, {"a": 1}, 60, etag='"v1"')
+            self.assertEqual(len(cache), 1)
+
+            cache = ruobr_api.SQLiteCache(path)
+            self.assertEqual(cache.get(key), {"a": 1})
+            cache.set(key, {"a": 1}, -1, etag='"v1"')
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(cache.get_stale(key), ({"a": 1}, '"v1"', None))
+            cache.invalidate("u", "guide/")
+            self.assertIsNone(cache.get_stale(key))
+
+    def test_evictionAndTouch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ruobr_api.SQLiteCache(os.path.join(directory, "cache.db"), 10)
+            for i in range(10):
+                cache.set(("u", "p", f"guide/?child={i}"), i, 60)
+            self.assertEqual(len(cache), 10)
+            cache.set(("u", "p", "ios/?child=1"), 1, 60)
+            # Очистка оставляет 90% лимита, первыми удаляются старые записи
+            self.assertEqual(len(cache), 9)
+            self.assertIsNone(cache.get(("u", "p", "guide/?child=0")))
+
+            # Чтение в пределах touch_interval ничего не пишет в файл
+            changes = cache._db().total_changes
+            self.assertEqual(cache.get(("u", "p", "ios/?child=1")), 1)
+            self.assertEqual(cache._db().total_changes, changes)
+            cache.touch_interval = 0
+            cache.get(("u", "p", "ios/?child=1"))
+            self.assertEqual(cache._db().total_changes, changes + 1)
+
+    def test_accountHashed(self):
+        import base64
+        import sqlite3
+
+        username = base64.b64encode(b"secret_login").decode()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.db")
+            # Файл прошлой версии с логином в открытом виде
+            db = sqlite3.connect(path)
+            db.execute(
+                "CREATE TABLE responses (key TEXT PRIMARY KEY, username TEXT, "
+                "target TEXT, endpoint TEXT, body TEXT, size INTEGER, fetched REAL, "
+                "expires REAL, accessed REAL, etag TEXT, last_modified TEXT)"
+            )
+            db.execute(
+                "INSERT INTO responses VALUES "
+                "('k', ?, 'ios/', 'ios/', '1', 1, 0, 0, 0, NULL, NULL)",
+                (username,),
+            )
+            db.commit()
+            db.close()
+
+            cache = ruobr_api.SQLiteCache(path)
+            cache.set((username, "p", "guide/"), 1, 60)
+            cache._db().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            with open(path, "rb") as f:
+                self.assertNotIn(username.encode(), f.read())
+            cache.invalidate(username)
+            self.assertEqual(len(cache), 0)
+
+
+class ChangesTests(unittest.TestCase):
+    def test_mail(self):
+        tracker = ruobr_api.ChangeTracker()
+        changes = tracker.mail("user", [{"id": 1, "text": "a"}, {"id": 2, "text": "b"}])
+        self.assertTrue(changes.initial)
+        changes = tracker.mail("user", [{"id": 2, "text": "c"}, {"id": 3, "text": "d"}])
+        self.assertEqual(changes.added, [{"id": 3, "text": "d"}])
+        self.assertEqual(changes.changed, [{"id": 2, "text": "c"}])
+        self.assertEqual(changes.removed, [1])
+        self.assertFalse(changes.initial)
+
+    def test_typed(self):
+        from ruobr_api.models import ControlMarks, Lesson, typed
+
+        lessons = [{"id": 1, "topic": "a", "task": {"id": 5}}, {"id": 2, "topic": "b"}]
+        marks = [{"period": 1, "marks": [{"subject_id": 7, "mark": "4"}]}]
+        tracker = ruobr_api.ChangeTracker()
+        tracker.timetable("user", lessons)
+        tracker.control_marks("user", marks)
+        changes = tracker.timetable("user", typed(Lesson, lessons))
+        self.assertEqual((changes.added, changes.changed), ([], []))
+        changes = tracker.timetable("user", typed(Lesson, [{"id": 2, "topic": "c"}]))
+        self.assertEqual(
+            (changes.changed, changes.removed), ([{"id": 2, "topic": "c"}], [1])
+        )
+        changes = tracker.control_marks("user", typed(ControlMarks, marks))
+        self.assertEqual((changes.added, changes.changed), ([], []))
+
+    def test_controlMarks(self):
+        tracker = ruobr_api.ChangeTracker(max_entries=1)
+        marks = [{"period": 1, "marks": [{"subject_id": 7, "mark": "4"}]}]
+        tracker.control_marks("user", marks)
+        changes = tracker.control_marks("user", [{"period": 1, "marks": []}])
+        self.assertEqual(changes.removed, [(1, 7)])
+        tracker.mail("user", [])
+        self.assertEqual(len(tracker), 1)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy не установлен")
+class AnalyticsTests(unittest.TestCase):
+    def test_marksFrame(self):
+        from ruobr_api.analytics import MarksFrame
+
+        frame = MarksFrame.from_all_marks(
+            {
+                "a": {
+                    1: {10: [{"mark": "5"}, {"mark": "4", "weight": 3}, {"mark": "н"}]},
+                    2: {10: [{"mark": "2"}]},
+                },
+                "b": {1: {10: [{"mark": "4"}]}},
+            }
+        )
+        self.assertEqual(len(frame), 4)
+        self.assertEqual(frame.averages(("student", "period"))[("a", 1)], 4.5)
+        self.assertEqual(frame.weighted_averages()[("a", 10)], 3.8)
+        self.assertEqual(
+            frame.mark_counts(("subject_id",))[(10,)], {2.0: 1, 4.0: 2, 5.0: 1}
+        )
+        self.assertEqual(frame.period_deltas(), {("a", 10, 2): -2.5})
+
+
+class TestingTests(unittest.TestCase):
+    def test_recordReplay(self):
+        from ruobr_api.stub import StubServer
+        from ruobr_api.testing import Cassette, RecordTransport, ReplayTransport
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "ruobr.json")
+            cassette = Cassette(path)
+            with StubServer() as server:
+                with httpx.Client(transport=RecordTransport(cassette)) as client:
+                    r = ruobr_api.Ruobr(
+                        "username", "password", client=client, base_url=server.base_url
+                    )
+                    mail = r.get_mail()
+            cassette.save()
+
+            with httpx.Client(transport=ReplayTransport(Cassette(path))) as client:
+                r = ruobr_api.Ruobr("username", "password", client=client)
+                self.assertEqual(r.get_mail(), mail)
+                with self.assertRaises(KeyError):
+                    r.get_guide()
+
+    def test_keepAliveLatency(self):
+        from ruobr_api.stub import StubServer
+
+        # С алгоритмом Нейгла 20 запросов по одному соединению заняли бы ~0.9 с
+        with StubServer() as server, httpx.Client() as client:
+            started = time.perf_counter()
+            for _ in range(20):
+                client.get(server.base_url + "guide/?child=1")
+            self.assertLess(time.perf_counter() - started, 0.4)
+
+    def test_errorInjection(self):
+        from ruobr_api.stub import StubServer
+
+        with StubServer(error_rate=1.0) as server:
+            with ruobr_api.Ruobr("username", "password", base_url=server.base_url) as r:
+                with self.assertRaises(ruobr_api.NoSuccessException):
+                    r.get_user()
+
+
+class CliTests(unittest.TestCase):
+    def test_poll(self):
+        from ruobr_api.stub import StubServer
+
+        with tempfile.TemporaryDirectory() as folder, StubServer() as server:
+            credentials = os.path.join(folder, "accounts.csv")
+            checkpoint = os.path.join(folder, "checkpoint")
+            with open(credentials, "w") as f:
+                f.write("# логин,пароль\n")
+                f.writelines(f"user{i},password\n" for i in range(10))
+            command = [sys.executable, "-m", "ruobr_api", credentials]
+            command += ["--call", "get_mail", "--processes", "2", "--progress", "0"]
+            command += ["--base-url", server.base_url, "--checkpoint", checkpoint]
+
+            lines = subprocess.check_output(command).decode("UTF-8").splitlines()
+            results = [json.loads(line) for line in lines]
+            self.assertEqual(len(results), 20)
+            self.assertTrue(all(r["error"] is None for r in results))
+            with open(checkpoint) as f:
+                self.assertEqual(len(f.readlines()), 10)
+
+            # Все аккаунты уже в checkpoint, повторный запуск ничего не делает
+            self.assertEqual(subprocess.check_output(command), b"")
+
+
+class StreamTests(unittest.TestCase):
+    def test_arrayStream(self):
+        from ruobr_api.stream import ArrayStream
+
+        data = {
+            "status": "lessons",
+            "other": {"lessons": [0]},
+            "lessons": [{"id": i, "topic": 'a"\\]}[{,ж' * i} for i in range(20)],
+        }
+        body = json.dumps(data, ensure_ascii=False).encode("UTF-8")
+        for size in (1, 7, len(body)):
+            stream = ArrayStream("lessons")
+            items = []
+            for i in range(0, len(body), size):
+                items += stream.feed(body[i : i + size])
+            self.assertEqual(items, data["lessons"])
+            self.assertTrue(stream.done)
+
+        stream = ArrayStream("lessons")
+        self.assertEqual(stream.feed(b'{"success": false, "error": "x"}'), [])
+        self.assertFalse(stream.found)
+
+    def test_iterTimetableMetrics(self):
+        from ruobr_api.stub import StubServer
+
+        metrics = ruobr_api.Metrics()
+        start, end = "2020-09-01", "2020-09-14"
+        with StubServer() as server:
+            with ruobr_api.Ruobr(
+                "username", "password", base_url=server.base_url, hooks=metrics.hooks
+            ) as r:
+                self.assertEqual(
+                    list(r.iter_timetable(start, end)), r.get_timetable(start, end)
+                )
+
+            async def collect():
+                async with ruobr_api.AsyncRuobr(
+                    "username",
+                    "password",
+                    base_url=server.base_url,
+                    hooks=metrics.hooks,
+                ) as r:
+                    return [lesson async for lesson in r.iter_timetable(start, end)]
+
+            self.assertEqual(len(loop.run_until_complete(collect())), 72)
+        timetable = metrics.as_dict()["timetable2/"]
+        self.assertEqual(timetable["requests"], 3)
+        self.assertGreater(timetable["bytes"], 0)
+
+
+class DecoderTests(unittest.TestCase):
+    def test_parse(self):
+        for name in ruobr_api.decoders.BACKENDS:
+            try:
+                r = ruobr_api.Ruobr("username", "password", decoder=name)
+                r._parse(httpx.Response(200, content=b"[]"))
+            except ImportError:
+                continue
+            data = r._parse(httpx.Response(200, content=b'{"success": true, "a": 1}'))
+            self.assertEqual(data, {"success": True, "a": 1})
+            with self.assertRaises(ruobr_api.AuthenticationException):
+                r._parse(
+                    httpx.Response(
+                        200, content=b'{"success": false, "error_type": "auth"}'
+                    )
+                )
+            with self.assertRaises(ruobr_api.NoSuccessException):
+                r._parse(httpx.Response(502, content=b"bad gateway"))
+
+    def test_getDecoder(self):
+        self.assertIs(ruobr_api.decoders.get_decoder(len), len)
+        with self.assertRaises(ValueError):
+            ruobr_api.decoders.get_decoder("yaml")
+
+
+class ModelsTests(unittest.TestCase):
+    def test_lesson(self):
+        from ruobr_api.models import ControlMarks, Lesson
+        import pickle
+
+        data = {"id": 1, "subject": "Алгебра", "task": {"title": "№ 1"}}
+        lesson = Lesson(data)
+        self.assertEqual(lesson.subject, "Алгебра")
+        self.assertIsNone(lesson.topic)
+        self.assertEqual(lesson.task, {"title": "№ 1"})  # редкое поле
+        self.assertEqual(lesson["id"], 1)
+        self.assertNotIn("topic", lesson)
+        self.assertEqual(lesson.to_dict(), data)
+        self.assertEqual(pickle.loads(pickle.dumps(lesson)), lesson)
+        with self.assertRaises(AttributeError):
+            lesson.homework
+
+        marks = ControlMarks({"period": 1, "marks": [{"subject_id": 2, "mark": "5"}]})
+        self.assertEqual(marks.marks[0].mark, "5")
+        self.assertEqual(ruobr_api.utils.mark_pairs([marks]), [(1, 2)])
+
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow не установлен")
+class ExportTests(unittest.TestCase):
+    def test_lessonBatches(self):
+        from ruobr_api.export import lesson_batches, lesson_schema, write_parquet
+        import pyarrow.parquet as pq
+
+        lessons = [
+            (1, {"id": i, "date": "2020-04-27", "subject": "Алгебра", "task": {"a": 1}})
+            for i in range(5)
+        ]
+        batches = list(lesson_batches(lessons, batch_size=2))
+        self.assertEqual([b.num_rows for b in batches], [2, 2, 1])
+        self.assertEqual(batches[0].schema, lesson_schema())
+        self.assertEqual(
+            batches[0].column("subject").dictionary.to_pylist(), ["Алгебра"]
+        )
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "lessons.parquet")
+            self.assertEqual(write_parquet(path, batches, lesson_schema()), 5)
+            table = pq.read_table(path)
+        self.assertEqual(table.column("id").to_pylist(), list(range(5)))
+        self.assertEqual(table.column("task")[0].as_py(), '{"a": 1}')
+
+    def test_markBatches(self):
+        from ruobr_api.export import mark_batches, mark_rows
+
+        rows = mark_rows({7: {1: {10: [{"mark": "5"}, {"mark": "н"}]}}})
+        batch = next(mark_batches(rows))
+        self.assertEqual(batch.column("value").to_pylist()[0], 5.0)
+        self.assertEqual(batch.column("mark").to_pylist(), ["5", "н"])
+
+
+class Http2Tests(unittest.TestCase):
+    def versions(self, http2) -> set:
+        from ruobr_api.stub import StubServer
+
+        versions = set()
+        hook = lambda target, response, **info: versions.add(response.http_version)
+
+        async def run(base_url):
+            async with ruobr_api.AsyncRuobr(
+                "username",
+                "password",
+                base_url=base_url,
+                http2=http2,
+                hooks={"response": [hook]},
+            ) as r:
+                await r.get_user()
+                await asyncio.gather(r.get_guide(), r.get_mail())
+
+        with StubServer() as server:
+            loop.run_until_complete(run(server.base_url))
+        return versions
+
+    def test_fallback(self):
+        from unittest import mock
+
+        with mock.patch.dict(sys.modules, {"h2": None}):
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(ruobr_api.client.http2_options(), {})
+            with self.assertWarns(RuntimeWarning):
+                self.assertEqual(self.versions("h2c"), {"HTTP/1.1"})
+
+    def test_h2c(self):
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            self.skipTest("h2 не установлен")
+        self.assertEqual(self.versions("h2c"), {"HTTP/2"})
+
+
+class ImportTests(unittest.TestCase):
+    def test_lazyImports(self):
+        # Тяжёлые зависимости не должны загружаться при импорте пакета
+        code = "import sys, ruobr_api; print(' '.join(sorted(sys.modules)))"
+        modules = subprocess.check_output([sys.executable, "-c", code]).split()
+        for name in (b"httpx", b"asyncio", b"concurrent.futures", b"sqlite3"):
+            self.assertNotIn(name, modules)
+
 
 if __name__ == "__main__":
     unittest.main()